@@ -1,9 +1,31 @@
+import atexit
+import logging
+import threading
 from flask import Flask, render_template, send_file
 from config import Config
-from routes.api import api
+from routes.api import EXTENSION_KEY, api, init_app, shutdown_resources, warm_up
+from utils.time_utils import configure_analysis_cache
 
 app = Flask(__name__)
 app.config.from_object(Config)
+logging.basicConfig(level=app.config['LOG_LEVEL'],
+                    format='%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s')
+configure_analysis_cache(app.config['ANALYSIS_CACHE_SIZE'])
+
+# 创建各请求共享的处理器、缓存和任务队列
+init_app(app)
+atexit.register(shutdown_resources, app)
+
+
+def start_background_services(warm=True):
+    """
+    启动后台线程：预热（服务先开始响应，健康检查不等待pandas等依赖导入）和定期存储清理
+    warm为False时只启动存储清理（预加载模式下已在master中预热）
+    """
+    if warm and app.config['WARMUP_ON_START']:
+        threading.Thread(target=warm_up, args=(app,), name='warm-up', daemon=True).start()
+    if app.config['STORAGE_GC_ENABLED']:
+        app.extensions[EXTENSION_KEY]['storage'].start()
 
 # 注册蓝图
 app.register_blueprint(api, url_prefix='/api')
@@ -30,8 +52,10 @@ def favicon():
 
 if __name__ == '__main__':
     print("🚀 启动模块化打卡数据处理系统...")
-    print("📱 访问地址: http://localhost:811")
+    print(f"📱 访问地址: http://localhost:{app.config['SERVER_PORT']}")
     print("✨ 包含完整的错误检测、高亮标记和详细报告功能")
     print("🔄 新增：支持上传修改后的错误表格重新处理")
     print("🏗️ 架构：模块化设计，易于维护和扩展")
-    app.run(host='0.0.0.0', port=811, debug=True)
\ No newline at end of file
+    print("🏭 生产环境请使用: gunicorn -c gunicorn.conf.py wsgi:app")
+    start_background_services()
+    app.run(host=app.config['SERVER_HOST'], port=app.config['SERVER_PORT'], debug=app.config['DEBUG'])
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+冷启动基准：在新的解释器进程中测量
+
+- 导入app（服务可以开始响应健康检查）的耗时及最慢的模块
+- 从启动到第一次 /api/status 返回的耗时
+- 首次处理时才导入的处理依赖（processors.timecard_processor）的耗时
+
+用法:
+    python -m benchmarks.import_time --repeat 5 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STATUS_SCRIPT = """
+import json
+import time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+response = app.test_client().get('/api/status')
+assert response.status_code == 200
+ready = time.perf_counter()
+from processors.timecard_processor import TimecardProcessor
+loaded = time.perf_counter()
+print(json.dumps({'import_app': imported - started, 'first_status': ready - started,
+                  'processor_import': loaded - ready}))
+"""
+
+
+def _run(args):
+    return subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def measure_startup(repeat):
+    """返回各项耗时在repeat次中的最小值（秒）"""
+    runs = [json.loads(_run(['-c', _STATUS_SCRIPT]).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+    return {key: round(min(run[key] for run in runs), 4) for key in runs[0]}
+
+
+def slowest_imports(module='app', top=15):
+    """python -X importtime 的累计耗时最大的模块 [(模块, 累计毫秒), ...]"""
+    stderr = _run(['-X', 'importtime', '-c', f'import {module}']).stderr
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.append((name.strip(), int(cumulative) / 1000))
+    return sorted(timings, key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='冷启动与导入耗时基准')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', help='把结果保存为JSON文件')
+    args = parser.parse_args(argv)
+
+    startup = measure_startup(args.repeat)
+    imports = slowest_imports('app', args.top)
+
+    print(f"导入app:              {startup['import_app'] * 1000:8.1f} ms")
+    print(f"首次/api/status返回:  {startup['first_status'] * 1000:8.1f} ms")
+    print(f"首次处理时导入依赖:   {startup['processor_import'] * 1000:8.1f} ms")
+    print(f"\n导入app最慢的{args.top}个模块（累计）")
+    for name, ms in imports:
+        print(f"{ms:10.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'startup': startup, 'slowest_imports': imports}, f, ensure_ascii=False, indent=2)
+        print(f"\n📁 结果已保存: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
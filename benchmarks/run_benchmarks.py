@@ -0,0 +1,210 @@
+"""
+Timecard处理性能基准
+
+对不同规模的合成Timecard测量:
+- Step1 / Step2 端到端耗时及各阶段耗时
+- time_utils 各函数的单元格吞吐量（冷：分析缓存为空；热：缓存已填充）
+
+用法:
+    python -m benchmarks.run_benchmarks --sizes 100,1000,5000 --repeat 3
+    python -m benchmarks.run_benchmarks --sizes 1000 --workers 4 --reader pandas --json results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.timecard_generator import generate_timecard, generate_punch_cell  # noqa: E402
+from processors.timecard_processor import TimecardProcessor  # noqa: E402
+from utils import time_utils  # noqa: E402
+
+
+def _best_of(func, repeat, setup=None):
+    """执行repeat次，返回 (最短耗时, 中位耗时, 最后一次结果)；setup在每次执行前调用，不计入耗时"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings), result
+
+
+def _clear_analysis_cache():
+    time_utils.configure_analysis_cache(time_utils.ANALYSIS_CACHE_SIZE)
+
+
+def bench_steps(employees, days, repeat, workers, reader, work_dir, seed=0):
+    """对一个规模测量Step1和Step2，每次都清空分析缓存，结果缓存不启用"""
+    source = os.path.join(work_dir, f'timecard_{employees}x{days}.xlsx')
+    generated = generate_timecard(source, employees=employees, days=days, seed=seed)
+    processor = TimecardProcessor(work_dir, work_dir, workers=workers, reader=reader)
+
+    def run_step1():
+        result = processor.process_step1(source)
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return result
+
+    step1_best, step1_median, step1_result = _best_of(run_step1, repeat, setup=_clear_analysis_cache)
+    error_file = os.path.join(work_dir, step1_result['output_file'])
+
+    def run_step2():
+        result = processor.process_step2(error_file, step1_result['time_range'])
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        return result
+
+    step2_best, step2_median, step2_result = _best_of(run_step2, repeat, setup=_clear_analysis_cache)
+    processor.close()
+    cells = generated['punch_cells']
+    return {
+        'employees': employees,
+        'days': days,
+        'punch_cells': cells,
+        'step1': {
+            'best_seconds': round(step1_best, 4),
+            'median_seconds': round(step1_median, 4),
+            'cells_per_second': round(cells / step1_best),
+            'stage_timings': step1_result['stage_timings']
+        },
+        'step2': {
+            'best_seconds': round(step2_best, 4),
+            'median_seconds': round(step2_median, 4),
+            'cells_per_second': round(cells / step2_best),
+            'stage_timings': step2_result['stage_timings']
+        }
+    }
+
+
+def _time_utils_cases(cells):
+    """time_utils各函数的测量用例：{名称: 对单个单元格执行的函数}，输入预先准备好"""
+    tokens = [time_utils.tokenize_time_string(cell)['times'] for cell in cells]
+    minutes = [time_utils.normalize_time_list(times) for times in tokens]
+    even_minutes = [m for m in minutes if m and len(m) % 2 == 0] or [[540, 1080]]
+    analyses = [time_utils._analyze_time_cell(cell) for cell in cells]
+
+    return {
+        'get_minimum_distance': (time_utils.get_minimum_distance, cells),
+        'tokenize_time_string': (time_utils.tokenize_time_string, cells),
+        'analyze_time_cell(未缓存)': (time_utils._analyze_time_cell, cells),
+        'analyze_time_cell(缓存)': (time_utils.analyze_time_cell, cells),
+        'parse_time_string': (time_utils.parse_time_string, cells),
+        'validate_time_format': (time_utils.validate_time_format,
+                                 [time for times in tokens for time in times] or ['09:00']),
+        'normalize_time_list': (time_utils.normalize_time_list, tokens),
+        'daily_working_time': (time_utils.daily_working_time, even_minutes),
+        'calculate_working_hours_with_details': (time_utils.calculate_working_hours_with_details, minutes),
+        'detect_time_anomalies': (lambda pair: time_utils.detect_time_anomalies(pair[0], '员工', 1, pair[1]),
+                                  list(zip(cells, analyses))),
+    }
+
+
+def _throughput(calls, best, median):
+    return {
+        'best_seconds': round(best, 4),
+        'median_seconds': round(median, 4),
+        'calls_per_second': round(calls / best) if best else None
+    }
+
+
+def bench_time_utils(cell_count, repeat, seed=0):
+    """
+    测量time_utils各函数处理cell_count个单元格的吞吐量
+    cold: 每次执行前清空分析缓存；warm: 先完整执行一遍填充缓存，再测量（经过缓存的函数才有区别）
+    """
+    rnd = random.Random(seed)
+    cells = [generate_punch_cell(rnd) for _ in range(cell_count)]
+
+    results = {}
+    for name, (func, inputs) in _time_utils_cases(cells).items():
+        def run():
+            for value in inputs:
+                func(value)
+        cold_best, cold_median, _ = _best_of(run, repeat, setup=_clear_analysis_cache)
+        run()
+        warm_best, warm_median, _ = _best_of(run, repeat)
+        results[name] = {
+            'calls': len(inputs),
+            'cold': _throughput(len(inputs), cold_best, cold_median),
+            'warm': _throughput(len(inputs), warm_best, warm_median)
+        }
+    return results
+
+
+def _print_steps(step_results):
+    print(f"\n{'员工数':>8} {'天数':>4} {'打卡单元格':>10} {'Step1(s)':>10} {'单元格/s':>10} "
+          f"{'Step2(s)':>10} {'单元格/s':>10}")
+    for r in step_results:
+        print(f"{r['employees']:>8} {r['days']:>4} {r['punch_cells']:>10} "
+              f"{r['step1']['best_seconds']:>10.3f} {r['step1']['cells_per_second']:>10} "
+              f"{r['step2']['best_seconds']:>10.3f} {r['step2']['cells_per_second']:>10}")
+    for r in step_results:
+        for step in ('step1', 'step2'):
+            stages = ', '.join(f"{s['stage']} {s['seconds']:.3f}s" for s in r[step]['stage_timings'])
+            print(f"  {r['employees']}名员工 {step}: {stages}")
+
+
+def _print_time_utils(results, cell_count):
+    print(f"\ntime_utils ({cell_count}个单元格)")
+    print(f"{'函数':<40} {'调用次数':>10} {'冷-最短(s)':>10} {'冷-调用/s':>12} {'热-最短(s)':>10} {'热-调用/s':>12}")
+    for name, r in results.items():
+        cold, warm = r['cold'], r['warm']
+        print(f"{name:<40} {r['calls']:>10} {cold['best_seconds']:>10.4f} {cold['calls_per_second']:>12} "
+              f"{warm['best_seconds']:>10.4f} {warm['calls_per_second']:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Timecard处理性能基准')
+    parser.add_argument('--sizes', default='100,1000,5000', help='员工数量，逗号分隔')
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1, help='单元格分析的并行进程数')
+    parser.add_argument('--reader', default='xml', help='Timecard读取方式: xml / pandas / openpyxl')
+    parser.add_argument('--cells', type=int, default=20000, help='time_utils基准的单元格数量')
+    parser.add_argument('--skip-steps', action='store_true', help='只测量time_utils')
+    parser.add_argument('--json', help='把结果保存为JSON文件')
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'reader': args.reader,
+        'steps': [],
+        'time_utils': {}
+    }
+
+    if not args.skip_steps:
+        work_dir = tempfile.mkdtemp(prefix='timecard_bench_')
+        try:
+            for employees in (int(n) for n in args.sizes.split(',')):
+                report['steps'].append(
+                    bench_steps(employees, args.days, args.repeat, args.workers, args.reader, work_dir)
+                )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        _print_steps(report['steps'])
+
+    report['time_utils'] = bench_time_utils(args.cells, args.repeat)
+    _print_time_utils(report['time_utils'], args.cells)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📁 结果已保存: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+合成Timecard工作簿生成器
+
+生成与考勤机导出格式一致的工作簿（process_step1所需布局）：
+- 第1行 "List of Logs"，第3行 "Period : " 和时间范围
+- 第4行为日期行
+- 每名员工占3行：信息行（第11列为姓名）、打卡行、日期行
+
+用法:
+    python -m benchmarks.timecard_generator output.xlsx --employees 500 --days 14 --error-rate 0.05
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+
+# 正常打卡使用的分隔符及默认权重（考勤机导出为换行，手工修改后常见其他分隔符）
+DEFAULT_SEPARATORS = {'\n': 0.85, ' ': 0.05, '\t': 0.03, ',': 0.04, ';': 0.03}
+
+# 错误单元格模板，覆盖各类异常检测器
+ERROR_CELLS = [
+    '09:00\n12:00\n13:00',          # 奇数时间记录
+    '12:00\n09:00\n13:00\n18:00',   # 时间顺序错误
+    '25:00\n09:00\n18:00',          # 无效时间格式
+    '10:61\n18:00',                 # 无效时间格式
+    '9:0012:00',                    # 冒号距离异常
+    '09:12:00\n18:00',              # 冒号距离异常
+    '05:00\n22:30',                 # 工作时间跨度异常
+    '09:00\n12:00 13:00\n18:00',    # 混合分隔符
+    'abc',                          # 解析错误
+]
+
+
+def _punch_minutes(rnd, punch_count):
+    """生成一天内递增的打卡时间（当日分钟数）"""
+    start = rnd.randint(7 * 60, 10 * 60)
+    if punch_count <= 2:
+        return [start, start + rnd.randint(8 * 60, 10 * 60)][:punch_count]
+
+    lunch_start = rnd.randint(11 * 60 + 30, 12 * 60 + 30)
+    lunch_end = lunch_start + rnd.randint(30, 60)
+    end = max(lunch_end + 60, start + rnd.randint(8 * 60, 10 * 60))
+    minutes = [start, lunch_start, lunch_end, end][:punch_count]
+    # 超过4次的打卡追加在下班后
+    while len(minutes) < punch_count:
+        minutes.append(min(minutes[-1] + rnd.randint(5, 90), 23 * 60 + 59))
+    return minutes
+
+
+def _format_cell(minutes, separator):
+    times = [f'{m // 60:02d}:{m % 60:02d}' for m in minutes]
+    if separator == '\n':
+        # 考勤机导出的换行格式带结尾换行
+        return '\n'.join(times) + '\n'
+    return separator.join(times)
+
+
+def generate_punch_cell(rnd, punch_counts=(2, 4), separators=None, error_rate=0.05):
+    """生成一个打卡单元格文本"""
+    if rnd.random() < error_rate:
+        return rnd.choice(ERROR_CELLS)
+
+    separators = separators or DEFAULT_SEPARATORS
+    punch_count = rnd.choice(punch_counts)
+    separator = rnd.choices(list(separators), weights=list(separators.values()))[0]
+    return _format_cell(_punch_minutes(rnd, punch_count), separator)
+
+
+def generate_timecard(output_path, employees=100, days=14, start=date(2025, 7, 13), punch_counts=(2, 4),
+                      separators=None, error_rate=0.05, blank_rate=0.2, seed=0):
+    """
+    生成合成Timecard工作簿
+    employees: 员工数量
+    days: 考勤周期天数
+    punch_counts: 每天打卡次数的候选值
+    separators: {分隔符: 权重}，默认DEFAULT_SEPARATORS
+    error_rate: 错误单元格比例
+    blank_rate: 未打卡（空单元格）比例
+    返回生成的单元格统计
+    """
+    rnd = random.Random(seed)
+    dates = [start + timedelta(days=d) for d in range(days)]
+    end = dates[-1]
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Sheet1')
+    date_row = [d.day for d in dates]
+
+    worksheet.append(['List of Logs'])
+    worksheet.append([])
+    worksheet.append(['Period : ', None, f'{start:%Y/%m/%d} ~ {end:%m/%d}'])
+    worksheet.append(date_row)
+
+    punch_cells = 0
+    for i in range(employees):
+        info_row = [None] * 21
+        info_row[0], info_row[2] = 'No :', str(i + 1)
+        info_row[8], info_row[10] = 'Name :', f'员工{i + 1:05d}'
+        info_row[18], info_row[20] = 'Dept :', f'Dept{i % 5 + 1}'
+        worksheet.append(info_row)
+
+        punch_row = []
+        for _ in dates:
+            if rnd.random() < blank_rate:
+                punch_row.append(None)
+            else:
+                punch_row.append(generate_punch_cell(rnd, punch_counts, separators, error_rate))
+                punch_cells += 1
+        worksheet.append(punch_row)
+
+        # 最后一名员工后没有日期行
+        if i < employees - 1:
+            worksheet.append(date_row)
+
+    workbook.save(output_path)
+    return {'employees': employees, 'days': days, 'punch_cells': punch_cells}
+
+
+def _parse_separators(text):
+    """解析 "newline=0.8,space=0.1,comma=0.1" 形式的分隔符权重"""
+    names = {'newline': '\n', 'space': ' ', 'tab': '\t', 'comma': ',', 'semicolon': ';'}
+    separators = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        separators[names[name.strip()]] = float(weight)
+    return separators
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成合成Timecard工作簿')
+    parser.add_argument('output', help='输出的xlsx文件路径')
+    parser.add_argument('--employees', type=int, default=100)
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--punches', default='2,4', help='每天打卡次数候选值，逗号分隔')
+    parser.add_argument('--separators', help='分隔符权重，如 newline=0.8,space=0.1,comma=0.1')
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--blank-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stats = generate_timecard(
+        args.output,
+        employees=args.employees,
+        days=args.days,
+        punch_counts=tuple(int(n) for n in args.punches.split(',')),
+        separators=_parse_separators(args.separators) if args.separators else None,
+        error_rate=args.error_rate,
+        blank_rate=args.blank_rate,
+        seed=args.seed
+    )
+    print(f"✅ 已生成 {args.output}: {stats['employees']} 名员工, {stats['days']} 天, "
+          f"{stats['punch_cells']} 个打卡单元格")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,89 @@ import os
 # 基础配置
 UPLOAD_FOLDER = './uploads'
 PROCESSED_FOLDER = './processed'
-MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
+RESULT_CACHE_FOLDER = './cache'
+UPLOAD_SESSIONS_FOLDER = './uploads/.sessions'  # 分块上传未完成的数据
+MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB，表单上传和单个分块请求的上限（流式上传使用UPLOAD_MAX_BYTES）
+UPLOAD_MAX_BYTES = 500 * 1024 * 1024  # 流式上传和分块上传的文件大小上限
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 上传数据每次读取写入的块大小
+JOB_WORKERS = 4  # 后台任务线程数
+JOB_HISTORY_LIMIT = 500  # 保留的已完成任务记录数
+JOB_STATE_FOLDER = './processed/.jobs'  # 任务状态文件，gunicorn多个worker共享任务状态
+PROCESSING_WORKERS = 1  # 单元格分析进程数，大于1时启用按员工分片的并行模式
+RESULT_CACHE_ENABLED = True  # 相同内容的文件直接返回缓存的处理结果
+RESULT_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 结果缓存上限，超出后淘汰最久未使用的条目
+LOG_LEVEL = 'INFO'  # 日志级别，DEBUG时输出逐单元格的详细信息
+ANALYSIS_CACHE_SIZE = 65536  # 单元格分析缓存条目数（按原始打卡字符串）
+EXCEL_READER = 'xml'  # Timecard原始表读取方式: xml（直接解析XML，最快）/ pandas / openpyxl（只读流式，速度与pandas相近）
+HOLIDAY_COUNTRY = 'US'  # 法定假日所属国家（holidays库国家代码），None时只使用公司假期
+HOLIDAY_NAMES = ["New Year's Day", "Independence Day", "Labor Day", "Thanksgiving", "Christmas Day"]  # 计入报告的法定假日
+COMPANY_HOLIDAYS = {}  # 公司自定义假期，如 {'2025-12-24': 'Christmas Eve'}
+HOLIDAY_PRELOAD_YEARS = []  # 启动时预先构建假期索引的年份，其他年份首次使用时构建
+ATTENDANCE_RULES = {
+    'late_after': '10:00',  # 第一次打卡晚于此时间为迟到
+    'early_before': '17:00',  # 最后一次打卡早于此时间为早退
+    'no_lunch_punches': 2,  # 打卡次数等于此值为中午不打卡
+    'min_weekly_hours': 30  # 任一周正常工时超过此值的员工才检查考勤
+}
+
+# 服务配置
+SERVER_HOST = '0.0.0.0'
+SERVER_PORT = 811
+DEBUG = True  # 只影响 python app.py 启动的开发服务器
+
+# 生产模式（gunicorn -c gunicorn.conf.py wsgi:app），均可用同名环境变量覆盖
+# 后台任务状态写入JOB_STATE_FOLDER，多个worker之间可以互相查询任务；
+# 结果缓存索引和单元格分析缓存在各进程内独立，多进程时命中率会降低
+GUNICORN_WORKERS = 1
+GUNICORN_THREADS = 8  # 每个进程的请求线程数
+GUNICORN_TIMEOUT = 300  # 同步处理大文件可能较慢
+GUNICORN_GRACEFUL_TIMEOUT = 60
+GUNICORN_KEEPALIVE = 5
+GUNICORN_PRELOAD = True  # 在master中导入应用（pandas/openpyxl只导入一次），fork后共享
+WARMUP_ON_START = True  # 启动后预先导入处理依赖（pandas/openpyxl/holidays）并创建处理器，否则在首次处理请求时导入
+STORAGE_GC_ENABLED = True  # 后台定期清理uploads/和processed/中的任务目录
+STORAGE_TTL_SECONDS = 7 * 24 * 3600  # 任务目录和未完成的分块上传的保留时间
+STORAGE_MAX_BYTES = 5 * 1024 * 1024 * 1024  # 总大小上限，超过时从最久未修改的任务开始删除
+STORAGE_MIN_AGE_SECONDS = 600  # 最近修改过的任务可能正在处理，按大小淘汰时跳过
+STORAGE_SWEEP_INTERVAL = 3600  # 清理间隔（秒）
 
 # 创建必要的目录
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
+os.makedirs(RESULT_CACHE_FOLDER, exist_ok=True)
+os.makedirs(UPLOAD_SESSIONS_FOLDER, exist_ok=True)
+os.makedirs(JOB_STATE_FOLDER, exist_ok=True)
 
 # 应用程序配置
 class Config:
     UPLOAD_FOLDER = UPLOAD_FOLDER
     PROCESSED_FOLDER = PROCESSED_FOLDER
+    RESULT_CACHE_FOLDER = RESULT_CACHE_FOLDER
+    RESULT_CACHE_ENABLED = RESULT_CACHE_ENABLED
+    RESULT_CACHE_MAX_BYTES = RESULT_CACHE_MAX_BYTES
+    UPLOAD_SESSIONS_FOLDER = UPLOAD_SESSIONS_FOLDER
     MAX_CONTENT_LENGTH = MAX_CONTENT_LENGTH
+    UPLOAD_MAX_BYTES = UPLOAD_MAX_BYTES
+    UPLOAD_CHUNK_SIZE = UPLOAD_CHUNK_SIZE
+    JOB_WORKERS = JOB_WORKERS
+    JOB_HISTORY_LIMIT = JOB_HISTORY_LIMIT
+    JOB_STATE_FOLDER = JOB_STATE_FOLDER
+    PROCESSING_WORKERS = PROCESSING_WORKERS
+    EXCEL_READER = EXCEL_READER
+    HOLIDAY_COUNTRY = HOLIDAY_COUNTRY
+    HOLIDAY_NAMES = HOLIDAY_NAMES
+    COMPANY_HOLIDAYS = COMPANY_HOLIDAYS
+    HOLIDAY_PRELOAD_YEARS = HOLIDAY_PRELOAD_YEARS
+    ATTENDANCE_RULES = ATTENDANCE_RULES
+    ANALYSIS_CACHE_SIZE = ANALYSIS_CACHE_SIZE
+    LOG_LEVEL = LOG_LEVEL
+    SERVER_HOST = SERVER_HOST
+    SERVER_PORT = SERVER_PORT
+    DEBUG = DEBUG
+    WARMUP_ON_START = WARMUP_ON_START
+    STORAGE_GC_ENABLED = STORAGE_GC_ENABLED
+    STORAGE_TTL_SECONDS = STORAGE_TTL_SECONDS
+    STORAGE_MAX_BYTES = STORAGE_MAX_BYTES
+    STORAGE_MIN_AGE_SECONDS = STORAGE_MIN_AGE_SECONDS
+    STORAGE_SWEEP_INTERVAL = STORAGE_SWEEP_INTERVAL
     SECRET_KEY = 'your-secret-key-here' 
\ No newline at end of file
@@ -0,0 +1,48 @@
+# gunicorn配置：gunicorn -c gunicorn.conf.py wsgi:app
+# 默认值来自config.py，可用同名环境变量覆盖
+import os
+
+import config as app_config
+
+
+def _setting(name, cast=int):
+    value = os.environ.get(name)
+    if value is None:
+        return getattr(app_config, name)
+    if cast is bool:
+        return value.lower() in ('1', 'true', 'yes')
+    return cast(value)
+
+
+bind = os.environ.get('GUNICORN_BIND', f'{app_config.SERVER_HOST}:{app_config.SERVER_PORT}')
+workers = _setting('GUNICORN_WORKERS')
+threads = _setting('GUNICORN_THREADS')
+worker_class = 'gthread'
+timeout = _setting('GUNICORN_TIMEOUT')
+graceful_timeout = _setting('GUNICORN_GRACEFUL_TIMEOUT')
+keepalive = _setting('GUNICORN_KEEPALIVE')
+
+# 预加载应用：pandas、openpyxl等在master中导入一次，worker通过fork共享
+# 任务线程池和分析进程池都在首次使用时才创建，fork前没有后台线程
+preload_app = _setting('GUNICORN_PRELOAD', bool)
+
+accesslog = '-'
+errorlog = '-'
+loglevel = app_config.LOG_LEVEL.lower()
+
+
+def when_ready(server):
+    """预加载模式：在fork前于master中同步预热，所有worker共享已导入的依赖"""
+    if preload_app and app_config.WARMUP_ON_START:
+        from app import app
+        from routes.api import warm_up
+        warm_up(app)
+
+
+def post_fork(server, worker):
+    """
+    每个worker启动后台线程：存储定期清理（线程不能在fork前创建）；
+    非预加载模式下同时在后台预热，不阻塞接收请求
+    """
+    from app import start_background_services
+    start_background_services(warm=not preload_app)
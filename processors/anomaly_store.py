@@ -0,0 +1,60 @@
+from collections import Counter
+
+
+class AnomalyStore:
+    """
+    异常索引存储
+    - 每个单元格的异常列表及异常类型位掩码（按类型去重为O(1)）
+    - 错误单元格坐标集合
+    - 按异常类型、员工、日期列的计数
+    """
+
+    def __init__(self, anomaly_types):
+        self.type_bits = {anomaly_type: 1 << n for n, anomaly_type in enumerate(anomaly_types)}
+        self.cells = {}  # key: (row, col), value: list of anomalies
+        self.cell_masks = {}  # key: (row, col), value: 异常类型位掩码
+        self.error_cells = set()
+        self.type_counts = Counter()
+        self.employee_counts = Counter()
+        self.day_counts = Counter()
+
+    def _bit(self, anomaly_type):
+        bit = self.type_bits.get(anomaly_type)
+        if bit is None:
+            bit = self.type_bits[anomaly_type] = 1 << len(self.type_bits)
+        return bit
+
+    def add_cell(self, cell_key):
+        """登记一个已检查的单元格"""
+        if cell_key not in self.cells:
+            self.cells[cell_key] = []
+            self.cell_masks[cell_key] = 0
+
+    def add(self, cell_key, anomaly, employee=None, day=None, counted=True):
+        """添加异常，同一单元格的同类异常只记录一次，返回是否新增；counted为False时只记录到单元格，不计数"""
+        self.add_cell(cell_key)
+        bit = self._bit(anomaly['type'])
+        if self.cell_masks[cell_key] & bit:
+            return False
+
+        self.cell_masks[cell_key] |= bit
+        self.cells[cell_key].append(anomaly)
+        if not counted:
+            return True
+        self.type_counts[anomaly['type']] += 1
+        if employee is not None:
+            self.employee_counts[employee] += 1
+        if day is not None:
+            self.day_counts[day] += 1
+        return True
+
+    def mark_error(self, cell_key):
+        self.error_cells.add(cell_key)
+
+    @property
+    def error_count(self):
+        return len(self.error_cells)
+
+    def highlighted_cells(self):
+        """返回有异常的单元格及其异常列表"""
+        return ((cell_key, anomalies) for cell_key, anomalies in self.cells.items() if anomalies)
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """
+    本地后台任务队列
+    提交任务后立即返回任务ID，任务在线程池中执行，可随时查询状态、进度和结果
+    状态: queued -> running -> finished / failed
+    state_folder: 任务状态同时写入该目录下的 <任务ID>.json，多个进程（gunicorn的多个worker）
+    共享该目录时，任一进程都能查询其他进程提交的任务；为None时只保存在内存中
+    """
+
+    def __init__(self, max_workers=4, history_limit=500, state_folder=None):
+        self.history_limit = history_limit
+        self.state_folder = state_folder
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='timecard-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        if state_folder:
+            os.makedirs(state_folder, exist_ok=True)
+
+    def submit(self, kind, func, *args, **kwargs):
+        """提交任务，func需接受progress关键字参数用于上报进度，返回任务ID"""
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'state': 'queued',
+            'progress': 0,
+            'message': '排队中',
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim_history()
+            self._save(job)
+
+        self._executor.submit(self._run, job, func, args, kwargs)
+        logger.debug("任务已提交: %s (%s)", job_id, kind)
+        return job_id
+
+    def get(self, job_id):
+        """返回任务状态的副本，任务不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._load(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _update(self, job, **changes):
+        with self._lock:
+            job.update(changes)
+            self._save(job)
+
+    def _state_path(self, job_id):
+        if not self.state_folder or not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+            return None
+        return os.path.join(self.state_folder, f'{job_id}.json')
+
+    def _save(self, job):
+        """写入任务状态文件，先写临时文件再替换，其他进程不会读到半个文件"""
+        path = self._state_path(job['job_id'])
+        if path is None:
+            return
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False, default=_json_default)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("⚠️ 任务状态写入失败: %s, %s", job['job_id'], e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _load(self, job_id):
+        """读取其他进程提交的任务状态"""
+        path = self._state_path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _discard_state(self, job_id):
+        """删除已移出历史记录的任务状态文件"""
+        path = self._state_path(job_id)
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("⚠️ 任务状态删除失败: %s, %s", job_id, e)
+
+    def _run(self, job, func, args, kwargs):
+        self._update(job, state='running', message='处理中', started_at=time.time())
+
+        def progress(percent, message=''):
+            self._update(job, progress=percent, message=message)
+
+        try:
+            result = func(*args, progress=progress, **kwargs)
+        except Exception as e:
+            logger.exception("任务异常: %s (%s)", job['job_id'], job['kind'])
+            self._update(job, state='failed', message='处理失败', error=str(e),
+                         result={'success': False, 'error': str(e), 'traceback': traceback.format_exc()},
+                         finished_at=time.time())
+            return
+
+        if isinstance(result, dict) and not result.get('success', True):
+            self._update(job, state='failed', message='处理失败', error=result.get('error'),
+                         result=result, finished_at=time.time())
+        else:
+            self._update(job, state='finished', progress=100, message='处理完成',
+                         result=result, finished_at=time.time())
+        logger.info("任务结束: %s (%s), 状态=%s, 排队%.2fs, 处理%.2fs", job['job_id'], job['kind'], job['state'],
+                    job['started_at'] - job['created_at'], job['finished_at'] - job['started_at'])
+
+    def _trim_history(self):
+        """只保留最近的任务记录，未完成的任务不会被移除"""
+        excess = len(self._jobs) - self.history_limit
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]['state'] in ('finished', 'failed'):
+                del self._jobs[job_id]
+                self._discard_state(job_id)
+                excess -= 1
+
+
+def _json_default(value):
+    """numpy标量等转换为Python数值，其他对象转为字符串"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
@@ -0,0 +1,92 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.time_utils import analyze_time_cell, build_anomaly, detect_time_anomalies
+
+logger = logging.getLogger(__name__)
+
+# 每个分片至少包含的员工数，过小的分片进程间通信开销大于收益
+MIN_ROWS_PER_SHARD = 50
+
+
+def shard_bounds(num_rows, workers, min_rows=MIN_ROWS_PER_SHARD):
+    """把员工行切分为连续分片，返回 [(start, stop), ...]"""
+    shard_count = min(workers, num_rows // min_rows) if workers > 1 else 1
+    if shard_count <= 1:
+        return [(0, num_rows)]
+
+    size, extra = divmod(num_rows, shard_count)
+    bounds = []
+    start = 0
+    for n in range(shard_count):
+        stop = start + size + (1 if n < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def create_process_pool(workers):
+    """创建分析用进程池，使用spawn避免在后台任务线程中fork"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def map_shards(func, shards, workers, executor=None, on_broken=None):
+    """
+    按分片顺序执行func并返回结果列表
+    workers <= 1 或只有一个分片时在当前进程串行执行，否则使用进程池：
+    传入executor时复用该进程池（子进程中的分析缓存在多次调用间保留），否则临时创建；
+    结果顺序与分片顺序一致，合并后与串行结果完全相同
+    子进程异常退出（如内存不足被终止）导致进程池损坏时，调用on_broken(executor)丢弃该进程池，
+    本批分片改为在当前进程串行执行
+    """
+    if workers <= 1 or len(shards) <= 1:
+        return [func(shard) for shard in shards]
+
+    try:
+        if executor is not None:
+            return list(executor.map(func, shards))
+        with create_process_pool(min(workers, len(shards))) as executor:
+            return list(executor.map(func, shards))
+    except BrokenProcessPool:
+        logger.warning("⚠️ 分析进程异常退出，进程池已丢弃，本批改为串行处理")
+        if on_broken is not None:
+            on_broken(executor)
+        return [func(shard) for shard in shards]
+
+
+def analyze_step1_rows(rows):
+    """
+    Step1分片任务
+    rows: [(员工姓名, [单元格文本, ...]), ...]
+    返回每个员工的 [(日期列下标, 异常列表, 补充异常列表), ...]，空单元格跳过
+    补充异常只标记单元格，不计入异常统计（与原实现一致）
+    """
+    results = []
+    for employee_name, cells in rows:
+        row_result = []
+        for j, cell_value in enumerate(cells):
+            if cell_value == 'nan':
+                continue
+            analysis = analyze_time_cell(cell_value)
+            anomalies = detect_time_anomalies(cell_value, employee_name, j + 1, analysis)
+            row_result.append((j, anomalies, _odd_record_anomalies(analysis, anomalies, employee_name, j + 1)))
+        results.append(row_result)
+    return results
+
+
+def _odd_record_anomalies(analysis, anomalies, employee_name, column_idx):
+    """
+    按识别出的全部时间（含超出范围的）检查奇数记录：如 "25:00\n09:00\n18:00" 合法时间为偶数，
+    但打卡记录为奇数，同样无法配对；detect_time_anomalies已标记时不重复
+    """
+    time_count = len(analysis['times'])
+    if time_count % 2 == 0 or any(anomaly['type'] == 'odd_time_count' for anomaly in anomalies):
+        return []
+    return [build_anomaly('odd_time_count', f"时间数量: {time_count}", employee_name, column_idx)]
+
+
+def analyze_step2_cells(raw_values):
+    """Step2分片任务：逐个分析单元格文本"""
+    return [analyze_time_cell(raw_time_str) for raw_time_str in raw_values]
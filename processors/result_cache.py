@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，只在进程内加锁（开发服务器为单进程）
+    fcntl = None
+
+
+class ResultCache:
+    """
+    按内容寻址的处理结果缓存
+    键 = 输入文件内容的sha256 + 处理器版本 + 处理选项
+    每个条目是一个目录，保存结果字典(result.pkl)和输出工作簿；总大小超过上限时按最近最少使用淘汰
+    缓存目录本身就是索引（目录修改时间即最近使用时间），多个gunicorn worker共享同一个目录和大小上限；
+    读取时加共享文件锁，写入和淘汰时加排他文件锁
+    """
+
+    RESULT_FILE = 'result.pkl'
+    LOCK_FILE = '.lock'
+
+    def __init__(self, cache_folder, max_bytes=500 * 1024 * 1024, max_digests=1024):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.max_digests = max_digests
+        self.hits = 0  # 命中统计只针对当前进程
+        self.misses = 0
+        # 文件路径 -> (大小, 修改时间, sha256)，上传时已计算的哈希不再重复读取文件；按最近记录排序，超出上限淘汰最旧的
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_folder, exist_ok=True)
+        self._lock_path = os.path.join(cache_folder, self.LOCK_FILE)
+        self._remove_partial()
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """
+        进程内线程锁 + 跨进程文件锁
+        每次重新打开锁文件：flock属于打开的文件，fork后共享同一个文件描述符的进程之间互不排斥
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remove_partial(self):
+        """删除未完成写入的临时目录（写入在排他锁内进行，持有排他锁时存在的临时目录都是中断遗留的）"""
+        with self._locked(exclusive=True):
+            for name in os.listdir(self.cache_folder):
+                if '.tmp' in name:
+                    shutil.rmtree(os.path.join(self.cache_folder, name), ignore_errors=True)
+
+    @staticmethod
+    def _entry_size(entry_dir):
+        return sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+
+    def _scan(self):
+        """磁盘上的条目 [(最近使用时间, 键, 大小), ...]，按最近使用时间从旧到新排序"""
+        entries = []
+        with os.scandir(self.cache_folder) as it:
+            for entry in it:
+                if '.tmp' in entry.name or not entry.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    if os.path.isfile(os.path.join(entry.path, self.RESULT_FILE)):
+                        entries.append((entry.stat().st_mtime, entry.name, self._entry_size(entry.path)))
+                except OSError:  # 条目刚被其他进程删除
+                    continue
+        entries.sort()
+        return entries
+
+    @staticmethod
+    def file_digest(file_path, chunk_size=1024 * 1024):
+        """计算文件内容的sha256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def record_digest(self, file_path, sha256):
+        """记录上传时边写边计算的文件哈希"""
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, sha256)
+            self._digests.move_to_end(path)
+            while len(self._digests) > self.max_digests:
+                self._digests.popitem(last=False)
+
+    def _content_digest(self, file_path):
+        """文件内容的sha256，文件未变化时使用记录的哈希，已变化的记录删除"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        with self._lock:
+            recorded = self._digests.get(path)
+            if recorded is not None and recorded[:2] != (stat.st_size, stat.st_mtime_ns):
+                del self._digests[path]
+                recorded = None
+        if recorded is not None:
+            return recorded[2]
+        return self.file_digest(file_path)
+
+    def make_key(self, file_path, version, options):
+        """由文件内容、处理器版本和选项生成缓存键"""
+        digest = hashlib.sha256()
+        digest.update(self._content_digest(file_path).encode())
+        digest.update(str(version).encode())
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, key, output_folder):
+        """
+        命中时把缓存的工作簿复制到output_folder并返回结果字典副本（带cached标记），未命中返回None
+        条目可能由其他进程写入，每次都检查磁盘
+        """
+        entry_dir = os.path.join(self.cache_folder, key)
+        with self._locked(exclusive=False):
+            result_path = os.path.join(entry_dir, self.RESULT_FILE)
+            if not os.path.isfile(result_path):
+                self.misses += 1
+                return None
+
+            try:
+                with open(result_path, 'rb') as f:
+                    result = pickle.load(f)
+                output_file = result.get('output_file')
+                if output_file:
+                    # 输出文件可能位于任务目录中，条目只保存文件本身
+                    output_name = os.path.basename(output_file)
+                    shutil.copyfile(os.path.join(entry_dir, output_name), os.path.join(output_folder, output_name))
+                now = time.time()
+                os.utime(entry_dir, (now, now))
+                corrupt = False
+            except (OSError, pickle.UnpicklingError, EOFError):
+                corrupt = True
+
+            if corrupt:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if corrupt:
+            # 条目损坏，删除后按未命中处理
+            with self._locked(exclusive=True):
+                self._remove(key)
+            return None
+
+        result['cached'] = True
+        return result
+
+    def put(self, key, result, output_path=None):
+        """保存成功的处理结果及其输出工作簿，并按大小上限淘汰旧条目"""
+        if not result.get('success'):
+            return
+
+        with self._locked(exclusive=True):
+            entry_dir = os.path.join(self.cache_folder, key)
+            tmp_dir = f'{entry_dir}.tmp{os.getpid()}'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            try:
+                if output_path:
+                    shutil.copyfile(output_path, os.path.join(tmp_dir, os.path.basename(output_path)))
+                with open(os.path.join(tmp_dir, self.RESULT_FILE), 'wb') as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                self._remove(key)
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+
+            self._evict(keep=key)
+
+    def _remove(self, key):
+        shutil.rmtree(os.path.join(self.cache_folder, key), ignore_errors=True)
+
+    def _evict(self, keep):
+        """按磁盘上的全部条目（包括其他进程写入的）淘汰最久未使用的，直到总大小不超过上限（keep总是保留）"""
+        entries = self._scan()
+        total = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+            total -= size
+
+    def stats(self):
+        with self._locked(exclusive=False):
+            entries = self._scan()
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(entries),
+                'size_bytes': sum(size for _, _, size in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
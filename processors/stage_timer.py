@@ -0,0 +1,66 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss_mb():
+    """
+    当前进程的常驻内存(MB)，从/proc读取，开销很小；无法获取时（非Linux）返回None
+    不使用ru_maxrss：它是进程启动以来的峰值，长期运行的处理器中每个阶段都会得到同一个数
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * _PAGE_SIZE / 1024 / 1024, 1)
+
+
+class StageTimer:
+    """
+    分阶段计时：start(name)结束上一个阶段并开始新阶段，finish()结束最后一个阶段
+    每个阶段记录耗时、处理的单元格数、阶段结束时的常驻内存(rss_mb)和阶段内的内存变化(rss_delta_mb)
+    内存为当前进程的数据，并行分析的子进程不计入
+    """
+
+    def __init__(self, job_name=''):
+        self.job_name = job_name
+        self.stages = []
+        self._current = None
+        self._started_at = None
+        self._rss_at_start = None
+
+    def start(self, stage, cells=None):
+        self._close()
+        self._current = {'stage': stage, 'seconds': 0.0, 'cells': None, 'rss_mb': None, 'rss_delta_mb': None}
+        if cells is not None:
+            self.set_cells(cells)
+        self._rss_at_start = current_rss_mb()
+        self._started_at = time.perf_counter()
+
+    def set_cells(self, cells):
+        """设置当前阶段处理的单元格数"""
+        if self._current is not None:
+            self._current['cells'] = int(cells)
+
+    def finish(self):
+        """结束计时，返回各阶段记录"""
+        self._close()
+        return self.stages
+
+    def _close(self):
+        if self._current is None:
+            return
+        self._current['seconds'] = round(time.perf_counter() - self._started_at, 4)
+        rss = current_rss_mb()
+        self._current['rss_mb'] = rss
+        if rss is not None and self._rss_at_start is not None:
+            self._current['rss_delta_mb'] = round(rss - self._rss_at_start, 1)
+        self.stages.append(self._current)
+        logger.debug("⏱️ %s %s: %.3fs, 单元格=%s, 内存=%sMB(变化%sMB)", self.job_name, self._current['stage'],
+                     self._current['seconds'], self._current['cells'], rss, self._current['rss_delta_mb'])
+        self._current = None
@@ -0,0 +1,180 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class StorageManager:
+    """
+    上传和处理结果的存储管理
+    每个处理任务使用独立目录（<根目录>/<任务ID>/），不同任务的同名输出文件互不覆盖；
+    后台线程定期清理：超过保留时间(ttl)的条目删除，总大小超过上限(max_bytes)时按最久未修改淘汰
+    job_roots中的条目为任务目录，旧版平铺存放的文件不参与清理；
+    file_roots中同名（第一个"."之前相同）的文件为一个条目，如未完成分块上传的.part和.json，一起统计和删除
+    """
+
+    def __init__(self, job_roots, file_roots=(), ttl_seconds=7 * 24 * 3600, max_bytes=None, min_age_seconds=600,
+                 interval=3600):
+        self.job_roots = list(job_roots)
+        self.file_roots = list(file_roots)
+        self.roots = self.job_roots + self.file_roots
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.min_age_seconds = min_age_seconds  # 最近修改过的条目可能正在使用，不淘汰
+        self.interval = interval
+        self.last_sweep = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def new_job_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_job_id(value):
+        return isinstance(value, str) and len(value) == 32 and all(c in '0123456789abcdef' for c in value)
+
+    def job_dir(self, root, job_id, create=True):
+        """任务目录，create为True时不存在则创建"""
+        if not self.is_job_id(job_id):
+            raise ValueError(f'无效的任务ID: {job_id}')
+        path = os.path.join(root, job_id)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def _entry_info(entry):
+        """返回 (大小, 最后修改时间)，目录取其中文件的合计大小和最新修改时间"""
+        stat = entry.stat(follow_symlinks=False)
+        if not entry.is_dir(follow_symlinks=False):
+            return stat.st_size, stat.st_mtime
+        size, mtime = 0, stat.st_mtime
+        for dirpath, _, filenames in os.walk(entry.path):
+            for name in filenames:
+                try:
+                    file_stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                size += file_stat.st_size
+                mtime = max(mtime, file_stat.st_mtime)
+        return size, mtime
+
+    def _entries(self, root):
+        """根目录下参与统计和清理的条目 [((路径, ...), 大小, 最后修改时间), ...]"""
+        if not os.path.isdir(root):
+            return []
+        job_root = root in self.job_roots
+        groups = {}
+        with os.scandir(root) as it:
+            for entry in it:
+                if job_root:
+                    if not (self.is_job_id(entry.name) and entry.is_dir(follow_symlinks=False)):
+                        continue
+                    key = entry.name
+                elif entry.is_file(follow_symlinks=False):
+                    key = entry.name.split('.', 1)[0]
+                else:
+                    continue
+                try:
+                    size, mtime = self._entry_info(entry)
+                except OSError:
+                    continue
+                group = groups.setdefault(key, [[], 0, 0.0])
+                group[0].append(entry.path)
+                group[1] += size
+                group[2] = max(group[2], mtime)
+        return [(tuple(paths), size, mtime) for paths, size, mtime in groups.values()]
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def sweep(self, now=None):
+        """执行一次清理，返回清理统计"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = [entry for root in self.roots for entry in self._entries(root)]
+            removed = []
+
+            # 超过保留时间
+            if self.ttl_seconds:
+                expired = [entry for entry in entries if now - entry[2] > self.ttl_seconds]
+                removed.extend(expired)
+                entries = [entry for entry in entries if now - entry[2] <= self.ttl_seconds]
+
+            # 超过总大小上限，从最久未修改的开始淘汰
+            if self.max_bytes:
+                total = sum(size for _, size, _ in entries)
+                for entry in sorted(entries, key=lambda e: e[2]):
+                    if total <= self.max_bytes:
+                        break
+                    if now - entry[2] < self.min_age_seconds:
+                        continue
+                    removed.append(entry)
+                    total -= entry[1]
+
+            for paths, _, _ in removed:
+                self._remove(paths)
+
+            self.last_sweep = {
+                'time': now,
+                'removed_entries': len(removed),
+                'removed_bytes': sum(size for _, size, _ in removed)
+            }
+        if removed:
+            logger.info("🧹 存储清理: 删除 %d 项, 释放 %.1f MB",
+                        len(removed), self.last_sweep['removed_bytes'] / 1024 / 1024)
+        return self.last_sweep
+
+    def usage(self):
+        """各根目录的占用情况"""
+        roots = {}
+        for root in self.roots:
+            entries = self._entries(root)
+            roots[root] = {
+                'entries': len(entries),
+                'size_bytes': sum(size for _, size, _ in entries),
+                'oldest': min((mtime for _, _, mtime in entries), default=None)
+            }
+        disk = shutil.disk_usage(self.roots[0]) if self.roots else None
+        return {
+            'roots': roots,
+            'total_bytes': sum(root['size_bytes'] for root in roots.values()),
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'disk': {'total': disk.total, 'used': disk.used, 'free': disk.free} if disk else None,
+            'last_sweep': self.last_sweep
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning("⚠️ 存储清理失败: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """启动后台清理线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='storage-gc', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,152 +1,248 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime
-import holidays
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
+from datetime import date, timedelta
+import numbers
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Border, Side, Alignment
+from openpyxl.utils import get_column_letter
 from openpyxl.comments import Comment
 import traceback
+from itertools import chain
+import logging
 import os
+import threading
 from utils.time_utils import (
-    get_minimum_distance,
-    daily_working_time,
-    parse_time_string,
-    validate_time_format,
-    normalize_time_list,
+    format_minutes,
     detect_time_anomalies,
-    calculate_working_hours_with_details
+    analysis_cache_stats,
+    ANOMALY_DETECTORS
 )
+from processors.anomaly_store import AnomalyStore
+from processors.parallel import (
+    shard_bounds,
+    map_shards,
+    create_process_pool,
+    analyze_step1_rows,
+    analyze_step2_cells
+)
+from processors.stage_timer import StageTimer
+from utils.excel_reader import read_timecard
+from utils.holiday_calendar import get_default_calendar, parse_time_range
+from utils.hours_engine import build_punch_arrays, compute_punch_metrics, minutes_to_hours_array
+
+
+logger = logging.getLogger(__name__)
+
+# 处理逻辑或输出格式变化时递增，使旧的缓存结果失效
+PROCESSOR_VERSION = '2.6'
+
+# 考勤检测规则：上班晚于late_after为迟到，下班早于early_before为早退，
+# 打卡次数等于no_lunch_punches为中午不打卡；任一周工时超过min_weekly_hours的员工才检查
+DEFAULT_ATTENDANCE_RULES = {
+    'late_after': '10:00',
+    'early_before': '17:00',
+    'no_lunch_punches': 2,
+    'min_weekly_hours': 30
+}
+
+
+def _attendance_rules(overrides=None):
+    """合并考勤规则，时间阈值统一转换为当日分钟数"""
+    rules = dict(DEFAULT_ATTENDANCE_RULES, **(overrides or {}))
+    for key in ('late_after', 'early_before'):
+        if isinstance(rules[key], str):
+            hour, minute = rules[key].split(':')
+            rules[key] = int(hour) * 60 + int(minute)
+    return rules
+
+
+def _excel_value(value):
+    """与DataFrame.to_excel一致的单元格取值：空值留空，数字和日期原样，其他对象写为文本"""
+    if isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, (numbers.Number, date)):
+        return value
+    return str(value)
+
+
+def _cache_stats_since(before):
+    """本次处理期间单元格分析缓存的命中情况（并发处理时包含其他任务的查询）"""
+    after = analysis_cache_stats()
+    hits = after['hits'] - before['hits']
+    misses = after['misses'] - before['misses']
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        'size': after['size'],
+        'maxsize': after['maxsize']
+    }
+
+
+def _report_progress(progress, percent, message):
+    """向后台任务上报进度（同步调用时progress为None）"""
+    if progress is not None:
+        progress(percent, message)
 
 
 class TimecardProcessor:
-    def __init__(self, upload_folder, processed_folder):
+    def __init__(self, upload_folder, processed_folder, workers=1, reader='pandas', result_cache=None,
+                 holiday_calendar=None, attendance_rules=None):
         self.upload_folder = upload_folder
         self.processed_folder = processed_folder
-
-    def process_step1(self, file_path):
-        """Step1处理逻辑 - 修复高亮显示问题"""
+        self.workers = workers  # 大于1时按员工分片并行分析单元格
+        self.reader = reader  # Timecard原始表读取方式: pandas / openpyxl / xml
+        self.result_cache = result_cache  # ResultCache，相同内容的文件直接返回缓存结果
+        self.holiday_calendar = holiday_calendar or get_default_calendar()  # HolidayCalendar，按年份缓存假期索引
+        self.attendance_rules = _attendance_rules(attendance_rules)
+        self._pool = None  # 并行分析的进程池，首次使用时创建，供所有请求共享
+        self._pool_lock = threading.Lock()
+
+    def _process_pool(self):
+        """获取共享进程池，workers <= 1 时返回None"""
+        if self.workers <= 1:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = create_process_pool(self.workers)
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """丢弃已损坏的进程池，下次使用时重新创建"""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _map_shards(self, func, shards):
+        return map_shards(func, shards, self.workers, self._process_pool(), self._discard_pool)
+
+    def close(self):
+        """关闭共享进程池"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _output_file(self, output_path):
+        """结果中的输出文件：相对于处理目录的路径（任务目录/文件名）"""
+        return os.path.relpath(output_path, self.processed_folder).replace(os.sep, '/')
+
+    def _cached_result(self, file_path, options, output_folder):
+        """查询结果缓存，返回 (缓存键, 缓存结果)；未启用缓存时均为None"""
+        if self.result_cache is None:
+            return None, None
+        key = self.result_cache.make_key(file_path, PROCESSOR_VERSION, options)
+        cached = self.result_cache.get(key, output_folder)
+        if cached is not None:
+            cached['output_file'] = self._output_file(
+                os.path.join(output_folder, os.path.basename(cached['output_file'])))
+            logger.info("⚡ 命中结果缓存: %s, 输出文件: %s", options['step'], cached.get('output_file'))
+        return key, cached
+
+    def _store_result(self, key, result):
+        if key is not None:
+            self.result_cache.put(key, result, os.path.join(self.processed_folder, result['output_file']))
+
+    def process_step1(self, file_path, progress=None, output_folder=None):
+        """
+        Step1处理逻辑 - 修复高亮显示问题，progress(percent, message)用于上报进度
+        output_folder: 输出目录（任务目录），默认为处理目录
+        """
+        output_folder = output_folder or self.processed_folder
         try:
-            df = pd.read_excel(file_path)
-            print("📊 开始Step1处理...")
-            print(f"📝 原始数据形状: {df.shape}")
+            cache_key, cached = self._cached_result(file_path, {'step': 'step1'}, output_folder)
+            if cached is not None:
+                return cached
+
+            _report_progress(progress, 5, '读取文件')
+            cache_before = analysis_cache_stats()
+            timer = StageTimer('Step1')
+            timer.start('读取文件')
+            # 只读取Timecard布局需要的单元格
+            # 每名员工占3行：姓名在第3(i+1)行第10列，打卡在下一行
+            timecard = read_timecard(file_path, self.reader)
+            logger.info("📊 开始Step1处理: %s", os.path.basename(file_path))
+            logger.debug("📝 原始数据形状: %s", timecard['shape'])
+            timer.set_cells(timecard['shape'][0] * timecard['shape'][1])
 
             # 获取时间范围
-            time_range = (df.iloc[1, 2]).replace("/", "").replace("~", "-").replace(" ", "")
-            print(f"📅 时间范围: {time_range}")
+            time_range = timecard['period'].replace("/", "").replace("~", "-").replace(" ", "")
+            logger.debug("📅 时间范围: %s", time_range)
 
-            total_rows = df.shape[0]
+            total_rows = timecard['shape'][0]
             employee_amount = int((total_rows - 2) / 3)
-            print(f"👥 员工数量: {employee_amount}")
+            logger.debug("👥 员工数量: %d", employee_amount)
 
-            date_row = df.iloc[2].to_list()
-            date_range = [x for x in date_row if str(x) != 'nan']
+            date_range = [x for x in timecard['date_row'] if str(x) != 'nan']
             columns_name = list(map(int, date_range))
             columns_name.insert(0, 'name')
 
-            df_new = pd.DataFrame(index=range(employee_amount), columns=columns_name)
-
+            timer.start('整理数据', cells=employee_amount * len(date_range))
             # 创建新的员工和日常检查表
-            for i in range(employee_amount):
-                df_new.iloc[i, 0] = df.iloc[(i + 1) * 3, 10]
-                df_new.iloc[i, 1:] = df.iloc[(3 * (i + 1) + 1), 0:len(date_range)]
+            df_new = pd.DataFrame(
+                np.column_stack([timecard['names'], timecard['punches']]),
+                columns=columns_name,
+                dtype=object
+            )
 
             df_new['nan_count'] = df_new.isna().sum(axis=1)
             df_new_sorted = df_new.sort_values(by='nan_count', ascending=True).reset_index(drop=True)
             df_new = df_new_sorted.drop('nan_count', axis=1)
 
             # 增强的错误检测和高亮映射
-            print("🔍 开始增强的错误检测...")
-
-            # 用于存储每个单元格的异常信息
-            cell_anomalies = {}  # key: (row, col), value: list of anomalies
-            all_anomalies = []
-            error_value_location = []
-
-            # 定义异常类型颜色映射
-            anomaly_colors = {
-                'colon_distance': 'FFC7CE',  # 浅红色
-                'odd_time_count': 'FF0000',  # 深红色
-                'long_work_span': 'FFD700',  # 金色
-                'time_sequence_error': 'FF8C00',  # 深橙色
-                'invalid_time_format': 'FF6B6B',  # 橙红色
-                'parse_error': '9932CC',  # 紫色
-                'mixed_separators': '87CEEB',  # 天蓝色
-                'default': 'FFC7CE'  # 默认浅红色
-            }
-
-            for i in range(employee_amount):
-                employee_name = df_new.iloc[i, 0]
-                for j in range(len(date_range)):
-                    cell_value = str(df_new.iloc[i, j + 1])
-
-                    if cell_value == 'nan':
-                        continue
-
+            logger.debug("🔍 开始增强的错误检测...")
+            _report_progress(progress, 30, '错误检测')
+            timer.start('异常检测')
+
+            # 异常类型颜色映射，来自检测器注册表
+            anomaly_colors = {detector['type']: detector['color'] for detector in ANOMALY_DETECTORS}
+            anomaly_colors['default'] = 'FFC7CE'  # 默认浅红色
+
+            # 异常索引：单元格异常、错误位置集合及各维度计数
+            anomaly_store = AnomalyStore([detector['type'] for detector in ANOMALY_DETECTORS])
+
+            # 每个单元格只分析一次，所有检测器共享分析结果；按员工分片，可并行执行
+            employee_rows = [
+                (row[0], [str(value) for value in row[1:]])
+                for row in df_new.to_numpy(dtype=object).tolist()
+            ]
+            shards = [employee_rows[start:stop] for start, stop in shard_bounds(employee_amount, self.workers)]
+            shard_results = self._map_shards(analyze_step1_rows, shards)
+            row_results = chain.from_iterable(shard_results)
+
+            analyzed_cells = 0
+            for i, row_result in enumerate(row_results):
+                employee_key = str(employee_rows[i][0])
+                for j, anomalies, extra_anomalies in row_result:
+                    analyzed_cells += 1
+                    day = columns_name[j + 1]
                     cell_key = (i, j + 1)
-                    cell_anomalies[cell_key] = []
+                    anomaly_store.add_cell(cell_key)
 
-                    # 使用增强的异常检测
-                    anomalies = detect_time_anomalies(cell_value, employee_name, j + 1)
+                    for anomaly in anomalies:
+                        anomaly_store.add(cell_key, anomaly, employee_key, day)
 
-                    if anomalies:
-                        all_anomalies.extend(anomalies)
-                        cell_anomalies[cell_key].extend(anomalies)
-
-                        # 如果有严重错误，添加到错误位置列表
-                        for anomaly in anomalies:
-                            if anomaly['severity'] == 'error':
-                                if [i, j + 1] not in error_value_location:
-                                    error_value_location.append([i, j + 1])
-
-                    # 原有的冒号距离检测（保持兼容性）
-                    letter = [x for x in cell_value]
-                    min_distance = get_minimum_distance(letter)
-                    if min_distance == 3:
-                        colon_anomaly = {
-                            'type': 'colon_distance',
-                            'message': f'冒号距离异常 - 员工: {employee_name}, 列: {j + 1}',
-                            'severity': 'warning',
-                            'color': 'FFC7CE',
-                            'description': '时间格式问题，冒号前后数字位数异常'
-                        }
-                        if colon_anomaly not in cell_anomalies[cell_key]:
-                            cell_anomalies[cell_key].append(colon_anomaly)
-                        if [i, j + 1] not in error_value_location:
-                            error_value_location.append([i, j + 1])
-
-                    # 检测奇数时间记录
-                    time_list = parse_time_string(cell_value)
-                    if len(time_list) % 2 == 1:  # 奇数时间记录
-                        odd_anomaly = {
-                            'type': 'odd_time_count',
-                            'message': f'奇数时间记录 - 员工: {employee_name}, 列: {j + 1}',
-                            'severity': 'error',
-                            'color': 'FF0000',
-                            'description': '打卡次数为奇数，无法配对计算工时'
-                        }
-                        if odd_anomaly not in cell_anomalies[cell_key]:
-                            cell_anomalies[cell_key].append(odd_anomaly)
-                        if [i, j + 1] not in error_value_location:
-                            error_value_location.append([i, j + 1])
-
-            # 保存文件并添加高亮
-            output_filename = f'table_with_error_cells({time_range}).xlsx'
-            output_path = os.path.join(self.processed_folder, output_filename)
-            df_new.to_excel(output_path, index=None, header=True)
-
-            # 使用openpyxl添加高亮显示
-            print("🎨 应用高亮显示...")
-            workbook = load_workbook(output_path)
-            worksheet = workbook.active
-
-            # 应用高亮显示
-            for cell_key, anomalies in cell_anomalies.items():
-                if not anomalies:
-                    continue
+                        # 严重错误和冒号距离异常计入错误位置
+                        if anomaly['severity'] == 'error' or anomaly['type'] == 'colon_distance':
+                            anomaly_store.mark_error(cell_key)
+
+                    # 按全部打卡记录检查的奇数记录：标记单元格和错误位置，不计入异常统计
+                    for anomaly in extra_anomalies:
+                        anomaly_store.add(cell_key, anomaly, counted=False)
+                        anomaly_store.mark_error(cell_key)
+            timer.set_cells(analyzed_cells)
 
-                row_idx, col_idx = cell_key
+            # 计算每个异常单元格的高亮颜色和注释
+            logger.debug("🎨 计算高亮显示...")
+            _report_progress(progress, 70, '生成错误标记表')
+            timer.start('计算高亮')
+            cell_styles = {}  # key: (row, col), value: (color, comment_text)
 
+            for cell_key, anomalies in anomaly_store.highlighted_cells():
                 # 确定要使用的颜色（优先级：error > warning）
                 color = 'FFC7CE'  # 默认颜色
                 comment_text = ""
@@ -172,39 +268,21 @@ class TimecardProcessor:
                     for i, anomaly in enumerate(anomalies, 1):
                         comment_text += f"\n{i}. {anomaly['description']}"
 
-                # 应用高亮
-                try:
-                    # Excel行列索引从1开始，数据行从第2行开始（因为有标题行）
-                    excel_row = row_idx + 2
-                    excel_col = col_idx + 1
-
-                    cell = worksheet.cell(row=excel_row, column=excel_col)
-                    fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-                    cell.fill = fill
-
-                    # 添加注释
-                    if comment_text:
-                        cell.comment = Comment(comment_text, "系统检测")
-
-                    print(f"✅ 高亮单元格: 行{excel_row}, 列{excel_col}, 颜色#{color}")
+                cell_styles[cell_key] = (color, comment_text)
+            timer.set_cells(len(cell_styles))
 
-                except Exception as e:
-                    print(f"❌ 高亮失败: 行{row_idx}, 列{col_idx}, 错误: {e}")
-
-            workbook.save(output_path)
-            workbook.close()
+            # 单次写入：高亮和注释在写入时直接附加，无需保存后重新加载
+            output_path = os.path.join(output_folder, f'table_with_error_cells({time_range}).xlsx')
+            timer.start('写入工作簿', cells=df_new.size)
+            self._write_error_table(df_new, cell_styles, output_path)
+            stage_timings = timer.finish()
 
             # 生成增强的错误报告
             error_details = []
-            total_highlighted = len(cell_anomalies)
+            total_highlighted = len(anomaly_store.cells)
 
             # 按异常类型统计
-            anomaly_stats = {}
-            for anomaly in all_anomalies:
-                anomaly_type = anomaly['type']
-                if anomaly_type not in anomaly_stats:
-                    anomaly_stats[anomaly_type] = 0
-                anomaly_stats[anomaly_type] += 1
+            anomaly_stats = dict(anomaly_store.type_counts)
 
             type_names = {
                 'colon_distance': '冒号距离异常',
@@ -220,43 +298,112 @@ class TimecardProcessor:
                 type_name = type_names.get(anomaly_type, anomaly_type)
                 error_details.append(f"发现 {count} 个{type_name}")
 
-            print(f"✅ Step1处理完成")
-            print(f"📊 统计信息:")
-            print(f"   - 员工数量: {employee_amount}")
-            print(f"   - 错误位置: {len(error_value_location)}")
-            print(f"   - 高亮单元格: {total_highlighted}")
-            print(f"   - 异常类型: {list(anomaly_stats.keys())}")
+            logger.info("✅ Step1处理完成: 时间范围=%s, 员工=%d, 错误位置=%d, 高亮单元格=%d, 异常类型=%s",
+                        time_range, employee_amount, anomaly_store.error_count, total_highlighted,
+                        list(anomaly_stats))
 
-            return {
+            result = {
                 'success': True,
                 'time_range': time_range,
-                'output_file': output_filename,
+                'output_file': self._output_file(output_path),
                 'employee_count': employee_amount,
-                'error_count': len(error_value_location),
+                'error_count': anomaly_store.error_count,
                 'total_highlighted': total_highlighted,
                 'error_details': error_details,
-                'anomaly_stats': anomaly_stats
+                'anomaly_stats': anomaly_stats,
+                'anomaly_by_day': {str(day): anomaly_store.day_counts[day]
+                                   for day in columns_name[1:] if day in anomaly_store.day_counts},
+                'anomaly_by_employee': dict(anomaly_store.employee_counts.most_common()),
+                'cache_stats': _cache_stats_since(cache_before),
+                'stage_timings': stage_timings
             }
+            self._store_result(cache_key, result)
+            return result
 
         except Exception as e:
-            print(f"❌ Step1处理失败: {str(e)}")
+            logger.exception("❌ Step1处理失败: %s", e)
             return {
                 'success': False,
                 'error': str(e),
                 'traceback': traceback.format_exc()
             }
 
-    def process_step2(self, error_file_path, time_range):
-        """Step2处理逻辑 - 修复行列对齐问题"""
+    def _write_error_table(self, df_new, cell_styles, output_path):
+        """以只写模式一次写出错误检查表，格式与DataFrame.to_excel一致"""
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title='Sheet1')
+
+        # 标题行样式与pandas导出保持一致
+        header_font = Font(bold=True)
+        header_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                               top=Side(style='thin'), bottom=Side(style='thin'))
+        header_alignment = Alignment(horizontal='center', vertical='top')
+
+        header_row = []
+        for column_name in df_new.columns:
+            cell = WriteOnlyCell(worksheet, value=column_name)
+            cell.font = header_font
+            cell.border = header_border
+            cell.alignment = header_alignment
+            header_row.append(cell)
+        worksheet.append(header_row)
+
+        fills = {}
+        for row_idx, row in enumerate(df_new.itertuples(index=False, name=None)):
+            excel_row = []
+            for col_idx, value in enumerate(row):
+                value = _excel_value(value)
+
+                style = cell_styles.get((row_idx, col_idx))
+                if style is None:
+                    excel_row.append(value)
+                    continue
+
+                color, comment_text = style
+                if color not in fills:
+                    fills[color] = PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+                cell = WriteOnlyCell(worksheet, value=value)
+                cell.fill = fills[color]
+                # 添加注释
+                if comment_text:
+                    cell.comment = Comment(comment_text, "系统检测")
+                excel_row.append(cell)
+
+                # Excel行列索引从1开始，数据行从第2行开始（因为有标题行）
+                logger.debug("✅ 高亮单元格: 行%d, 列%d, 颜色#%s", row_idx + 2, col_idx + 1, color)
+            worksheet.append(excel_row)
+
+        workbook.save(output_path)
+        workbook.close()
+
+    def process_step2(self, error_file_path, time_range, progress=None, output_folder=None):
+        """
+        Step2处理逻辑 - 修复行列对齐问题，progress(percent, message)用于上报进度
+        output_folder: 输出目录（任务目录），默认为处理目录
+        """
+        output_folder = output_folder or self.processed_folder
         try:
-            print("📊 开始Step2处理...")
+            cache_key, cached = self._cached_result(error_file_path, {'step': 'step2', 'time_range': time_range,
+                                                                       'holidays': self.holiday_calendar.signature(),
+                                                                       'attendance': self.attendance_rules},
+                                                    output_folder)
+            if cached is not None:
+                return cached
+
+            logger.info("📊 开始Step2处理: %s", os.path.basename(error_file_path))
+            _report_progress(progress, 5, '读取文件')
+            cache_before = analysis_cache_stats()
+            timer = StageTimer('Step2')
+            timer.start('读取文件')
             df = pd.read_excel(error_file_path)
+            timer.set_cells(df.size)
             df_new = df.copy()
 
             # 保存原始打卡时间数据（用于显示）
             df_original_times = df.copy()
-            print(f"📝 原始数据形状: {df_original_times.shape}")
-            print(f"📝 列名: {list(df_original_times.columns)}")
+            logger.debug("📝 原始数据形状: %s", df_original_times.shape)
+            logger.debug("📝 列名: %s", df_original_times.columns)
 
             # 转换为字符串进行处理
             df = df.astype(str)
@@ -271,36 +418,64 @@ class TimecardProcessor:
                 'zero_hour_cells': 0
             }
 
-            print("🔄 开始时间数据处理和工时计算...")
+            logger.debug("🔄 开始时间数据处理和工时计算...")
+            _report_progress(progress, 20, '工时计算')
+            timer.start('工时计算')
 
             # 获取原始数据的基本信息
             num_employees = len(df)
             num_date_cols = len(df.columns) - 1  # 减去name列
-            print(f"👥 员工数量: {num_employees}")
-            print(f"📅 日期列数: {num_date_cols}")
-
-            # 处理时间数据并计算工时
-            for i in range(num_employees):
-                employee_name = df.iloc[i, 0]
-                print(f"🔄 处理员工: {employee_name} (行 {i})")
-
-                for j in range(num_date_cols):
-                    processing_stats['total_cells'] += 1
-
-                    if (df.iloc[i, j + 1] == 'nan'):
-                        continue
-
-                    raw_time_str = str(df.iloc[i, j + 1])
-
-                    # 检测异常
-                    anomalies = detect_time_anomalies(raw_time_str, employee_name, j + 1)
+            logger.debug("👥 员工数量: %d, 📅 日期列数: %d", num_employees, num_date_cols)
+
+            # 展平所有非空单元格，批量计算工时
+            cell_values = df.iloc[:, 1:].to_numpy(dtype=object)
+            cell_rows, cell_cols = np.nonzero(cell_values != 'nan')
+            raw_values = cell_values[cell_rows, cell_cols].tolist()
+            timer.set_cells(len(raw_values))
+
+            # 按员工分片分析单元格（cell_rows按行有序，分片边界对齐到员工行）；
+            # 修改后重新上传的表格中未变的单元格文本由单元格分析缓存直接命中
+            cell_bounds = [
+                tuple(np.searchsorted(cell_rows, (start, stop)))
+                for start, stop in shard_bounds(num_employees, self.workers)
+            ]
+            shards = [raw_values[start:stop] for start, stop in cell_bounds]
+            parsed_cells = list(chain.from_iterable(self._map_shards(analyze_step2_cells, shards)))
+
+            offsets, values = build_punch_arrays([parsed['minutes'] for parsed in parsed_cells])
+            metrics = compute_punch_metrics(offsets, values)
+            counts = metrics['counts']
+
+            is_valid = (counts > 0) & ~metrics['odd_count']
+            cell_hours = np.where(is_valid, minutes_to_hours_array(metrics['paired_minutes']), 0.0)
+
+            # 回填工时矩阵（空单元格为0）
+            hours_matrix = np.zeros(cell_values.shape, dtype=np.float64)
+            hours_matrix[cell_rows, cell_cols] = cell_hours
+            for j, col in enumerate(df_new.columns[1:]):
+                df_new[col] = hours_matrix[:, j]
+
+            processing_stats['total_cells'] = num_employees * num_date_cols
+            processing_stats['valid_cells'] = int(is_valid.sum())
+            processing_stats['invalid_cells'] = int((~is_valid).sum())
+            processing_stats['zero_hour_cells'] = int((cell_hours == 0).sum())
+
+            # 只有存在异常或工时异常的单元格才生成详细描述
+            hours_flags = ~is_valid | (cell_hours == 0) | (cell_hours > 12)
+            employee_names = df.iloc[:, 0].tolist()
+
+            for k in range(len(parsed_cells)):
+                parsed = parsed_cells[k]
+                if not (hours_flags[k] or parsed['anomalies']):
+                    continue
 
-                    # 使用增强的时间解析
-                    time_list = parse_time_string(raw_time_str)
-                    time_list_normalized = normalize_time_list(time_list)
+                i, j = int(cell_rows[k]), int(cell_cols[k])
+                raw_time_str = raw_values[k]
+                employee_name = employee_names[i]
 
-                    # 使用增强的工时计算
-                    work_result = calculate_working_hours_with_details(time_list_normalized)
+                if is_valid[k]:
+                    anomalies = detect_time_anomalies(raw_time_str, employee_name, j + 1, parsed)
+                    total_hours = float(cell_hours[k])
 
                     # 确定异常类型和描述
                     anomaly_type = None
@@ -313,72 +488,54 @@ class TimecardProcessor:
                         anomaly_type = primary_anomaly['type']
                         anomaly_description = primary_anomaly['description']
                         anomaly_color = primary_anomaly.get('color', 'FF0000')
-                    elif not work_result['is_valid']:
-                        anomaly_type = 'calculation_error'
-                        anomaly_description = f"计算错误: {work_result['error']}"
-                        anomaly_color = 'FF4500'  # 橙红色
-                    elif work_result['total_hours'] == 0 and len(time_list_normalized) > 0:
+                    elif total_hours == 0:
                         anomaly_type = 'zero_hours'
                         anomaly_description = '工时为零'
                         anomaly_color = 'FFB6C1'  # 浅粉色
-                    elif work_result['total_hours'] > 12:
+                    elif total_hours > 12:
                         anomaly_type = 'long_work_span'
-                        anomaly_description = f'工作时间异常长 ({work_result["total_hours"]}h)'
+                        anomaly_description = f'工作时间异常长 ({total_hours}h)'
                         anomaly_color = 'FFD700'  # 金色
 
-                    if work_result['is_valid']:
-                        df_new.iloc[i, j + 1] = work_result['total_hours']
-                        processing_stats['valid_cells'] += 1
-
-                        print(f"   ✅ 列{j + 1}: {raw_time_str} -> {work_result['total_hours']}h")
-
-                        # 如果有异常，记录到问题数据中
-                        if anomaly_type:
-                            problematic_data.append(
-                                f"{anomaly_description} - 员工: {employee_name}, 列: {j + 1}, "
-                                f"工时: {work_result['total_hours']}h"
-                            )
-                            problematic_cells_with_details[(i, j + 1)] = {
-                                'type': anomaly_type,
-                                'description': anomaly_description,
-                                'color': anomaly_color,
-                                'raw_value': raw_time_str,
-                                'employee': employee_name,
-                                'column': j + 1,
-                                'work_hours': work_result['total_hours']
-                            }
-                    else:
+                    # 如果有异常，记录到问题数据中
+                    if anomaly_type:
                         problematic_data.append(
-                            f"{work_result['error']} - 员工: {employee_name}, 列: {j + 1}"
+                            f"{anomaly_description} - 员工: {employee_name}, 列: {j + 1}, "
+                            f"工时: {total_hours}h"
                         )
                         problematic_cells_with_details[(i, j + 1)] = {
-                            'type': 'calculation_error',
-                            'description': work_result['error'],
-                            'color': 'FF4500',
+                            'type': anomaly_type,
+                            'description': anomaly_description,
+                            'color': anomaly_color,
                             'raw_value': raw_time_str,
                             'employee': employee_name,
-                            'column': j + 1
+                            'column': j + 1,
+                            'work_hours': total_hours
                         }
-                        df_new.iloc[i, j + 1] = 0
-                        processing_stats['invalid_cells'] += 1
-
-                        print(f"   ❌ 列{j + 1}: {raw_time_str} -> 计算失败")
-
-                    if df_new.iloc[i, j + 1] == 0:
-                        processing_stats['zero_hour_cells'] += 1
-
-            print(f"📊 处理统计:")
-            print(f"   - 总单元格: {processing_stats['total_cells']}")
-            print(f"   - 有效单元格: {processing_stats['valid_cells']}")
-            print(f"   - 无效单元格: {processing_stats['invalid_cells']}")
-            print(f"   - 零工时单元格: {processing_stats['zero_hour_cells']}")
+                else:
+                    if counts[k] == 0:
+                        work_error = 'No valid times'
+                    else:
+                        work_error = f'Odd number of times: {counts[k]}'
+                    problematic_data.append(
+                        f"{work_error} - 员工: {employee_name}, 列: {j + 1}"
+                    )
+                    problematic_cells_with_details[(i, j + 1)] = {
+                        'type': 'calculation_error',
+                        'description': work_error,
+                        'color': 'FF4500',
+                        'raw_value': raw_time_str,
+                        'employee': employee_name,
+                        'column': j + 1
+                    }
+
+            logger.debug("📊 处理统计: 总单元格=%d, 有效=%d, 无效=%d, 零工时=%d",
+                         processing_stats['total_cells'], processing_stats['valid_cells'],
+                         processing_stats['invalid_cells'], processing_stats['zero_hour_cells'])
 
             # 计算工时统计
-            print("📊 计算工时统计...")
-
-            # 确保df_new中的数据是数值型
-            for col in df_new.columns[1:]:  # 跳过name列
-                df_new[col] = pd.to_numeric(df_new[col], errors='coerce').fillna(0)
+            logger.debug("📊 计算工时统计...")
+            timer.start('工时汇总', cells=num_employees * num_date_cols)
 
             # 第一周工时计算（假设前7列是第一周）
             if num_date_cols >= 7:
@@ -404,15 +561,13 @@ class TimecardProcessor:
             Total_HEG = [HEG1[i] + HEG2[i] for i in range(num_employees)]
             Total_OT = [OT1[i] + OT2[i] for i in range(num_employees)]
 
-            print("📋 构建最终显示数据框...")
+            logger.debug("📋 构建最终显示数据框...")
 
             # 重新构建最终数据框，使用更简单的方法避免类型错误
             # 1. 从原始时间数据开始
             df_final = df_original_times.astype(str).replace('nan', '')
 
-            print(f"📝 最终数据框初始形状: {df_final.shape}")
-            print(f"📝 最终数据框列名: {list(df_final.columns)}")
-            print(f"📝 列名类型: {[type(col) for col in df_final.columns]}")
+            logger.debug("📝 最终数据框初始形状: %s, 列名: %s", df_final.shape, df_final.columns)
 
             # 2. 简化方法：直接添加所有工时列到最后
             original_date_cols = len(df_final.columns) - 1  # 减去name列
@@ -423,9 +578,9 @@ class TimecardProcessor:
                     hour_col = f"{date_col}_小时"
                     work_hours = df_new.iloc[:, i].values
                     df_final[hour_col] = work_hours
-                    print(f"   ✅ 添加 {hour_col} 列")
+                    logger.debug("   ✅ 添加 %s 列", hour_col)
                 except Exception as e:
-                    print(f"   ❌ 添加工时列失败: 列{i}, 错误: {e}")
+                    logger.warning("   ❌ 添加工时列失败: 列%d, 错误: %s", i, e)
                     continue
 
             # 3. 添加统计列到最后
@@ -436,8 +591,7 @@ class TimecardProcessor:
             df_final["Total_HEG"] = Total_HEG
             df_final["Total_OT"] = Total_OT
 
-            print(f"📝 最终数据框完成形状: {df_final.shape}")
-            print(f"📝 最终数据框列名: {list(df_final.columns)}")
+            logger.debug("📝 最终数据框完成形状: %s, 列名: %s", df_final.shape, df_final.columns)
 
             # 4. 替换0为空字符串（仅在工时和统计列中）
             # 找出所有工时列和统计列的索引
@@ -448,30 +602,36 @@ class TimecardProcessor:
                 if col in df_final.columns:
                     df_final[col] = df_final[col].replace(0, '')
 
-            print("🕐 检测考勤问题...")
-            # 识别需要检查迟到早退的员工
-            name_list = []
-            for i in range(num_employees):
-                if HEG1[i] > 30 or HEG2[i] > 30:
-                    name_list.append(df_final.iloc[i, 0])
+            logger.debug("🕐 检测考勤问题...")
+            _report_progress(progress, 50, '考勤检测')
+            timer.start('考勤检测')
+            # 识别需要检查迟到早退的员工（任一周工时超过阈值）
+            min_weekly_hours = self.attendance_rules['min_weekly_hours']
+            eligible = (np.asarray(HEG1) > min_weekly_hours) | (np.asarray(HEG2) > min_weekly_hours)
+            name_set = set(df_final.iloc[:, 0].to_numpy()[eligible].tolist())
 
-            print(f"👥 需要检查考勤的员工: {len(name_list)} 人")
+            logger.debug("👥 需要检查考勤的员工: %d 人", int(eligible.sum()))
 
             # 处理原始时间数据用于考勤检测
             df_original_for_display = df_original_times.astype(str).replace('nan', '')
 
-            # 检测迟到早退
-            attendance_result = self._detect_attendance_issues_enhanced(df_original_for_display, name_list, df_final)
+            # 检测迟到早退，直接使用工时计算得到的首末打卡和打卡次数
+            attendance_result = self._detect_attendance_issues_enhanced(df_original_for_display, name_set,
+                                                                        cell_rows, cell_cols, metrics)
+            timer.set_cells(attendance_result['checked_cells'])
 
             # 处理假期
-            print("🏖️ 处理假期信息...")
+            logger.debug("🏖️ 处理假期信息...")
+            timer.start('假期处理')
             holiday_result = self._process_holidays(time_range, df_final)
+            df_final = holiday_result['df_final']
 
             # 创建Excel文件
-            output_filename = f'work_attendance({time_range}).xlsx'
-            output_path = os.path.join(self.processed_folder, output_filename)
+            output_path = os.path.join(output_folder, f'work_attendance({time_range}).xlsx')
 
-            print("📋 生成Excel报告...")
+            logger.debug("📋 生成Excel报告...")
+            _report_progress(progress, 70, '生成Excel报告')
+            timer.start('生成报告', cells=df_final.size)
 
             # 修正problematic_cells的列索引，只针对原始时间列
             corrected_problematic_cells = {}
@@ -480,19 +640,21 @@ class TimecardProcessor:
                 if col_idx <= original_date_cols:  # 确保是原始时间列
                     corrected_problematic_cells[(row_idx, col_idx)] = details
 
+            # 处理日志中记录报告生成之前的各阶段耗时
             self._create_excel_report_enhanced(df_final, df_original_for_display, attendance_result,
                                                corrected_problematic_cells, original_date_cols,
-                                               output_path, holiday_result, processing_stats)
+                                               output_path, holiday_result, processing_stats,
+                                               stage_timings=list(timer.stages))
+            stage_timings = timer.finish()
 
-            print(f"✅ Step2处理完成")
-            print(f"📊 最终统计:")
-            print(f"   - 总工时: {sum(Total_HEG):.1f}h")
-            print(f"   - 加班时间: {sum(Total_OT):.1f}h")
-            print(f"   - 问题单元格: {len(corrected_problematic_cells)}")
+            logger.info("✅ Step2处理完成: 时间范围=%s, 员工=%d, 总工时=%.1fh, 加班时间=%.1fh, 问题单元格=%d, "
+                        "考勤问题=%d",
+                        time_range, num_employees, sum(Total_HEG), sum(Total_OT), len(corrected_problematic_cells),
+                        len(attendance_result['attendance_issues']))
 
-            return {
+            result = {
                 'success': True,
-                'output_file': output_filename,
+                'output_file': self._output_file(output_path),
                 'problematic_data': problematic_data,
                 'problematic_cells_count': len(corrected_problematic_cells),
                 'attendance_issues': attendance_result['attendance_issues'],
@@ -500,251 +662,197 @@ class TimecardProcessor:
                 'employee_count': len(df_final),
                 'total_working_hours': sum(Total_HEG),
                 'total_overtime': sum(Total_OT),
-                'processing_stats': processing_stats
+                'processing_stats': processing_stats,
+                'cache_stats': _cache_stats_since(cache_before),
+                'stage_timings': stage_timings
             }
+            self._store_result(cache_key, result)
+            return result
 
         except Exception as e:
-            print(f"❌ Step2处理失败: {str(e)}")
-            print(f"❌ 错误详情: {traceback.format_exc()}")
+            logger.exception("❌ Step2处理失败: %s", e)
             return {
                 'success': False,
                 'error': str(e),
                 'traceback': traceback.format_exc()
             }
 
-    def _detect_attendance_issues_enhanced(self, df_original_for_display, name_list, df_final):
-        """增强的考勤问题检测"""
-        r = df_original_for_display.shape[0]
-        c = df_original_for_display.shape[1]
-
-        highlight_cols_m = []  # 迟到
-        highlight_cols_n = []  # 中午不打卡
-        highlight_cols_e = []  # 早退
+    def _detect_attendance_issues_enhanced(self, df_original_for_display, name_set, cell_rows, cell_cols, metrics):
+        """
+        增强的考勤问题检测
+        name_set: 需要检查的员工姓名集合
+        cell_rows / cell_cols: 非空单元格的行和日期列下标
+        metrics: compute_punch_metrics的结果，与非空单元格一一对应
+        """
+        rules = self.attendance_rules
+        employee_names = df_original_for_display.iloc[:, 0].tolist()
+        date_cols = list(df_original_for_display.columns[1:])
+
+        # 需要检查的单元格：员工在检查名单中且有有效打卡
+        eligible_rows = np.fromiter((name in name_set for name in employee_names), dtype=bool,
+                                    count=len(employee_names))
+        checked = eligible_rows[cell_rows] & (metrics['counts'] > 0)
+
+        late = checked & (metrics['first'] > rules['late_after'])
+        no_lunch = checked & (metrics['counts'] == rules['no_lunch_punches'])
+        early = checked & (metrics['last'] < rules['early_before'])
+
+        # 按列、再按行的顺序输出，与报告中逐列检查的顺序一致
+        flagged = np.flatnonzero(late | no_lunch | early)
+        flagged = flagged[np.lexsort((cell_rows[flagged], cell_cols[flagged]))]
+
+        highlight_cols_m = [[] for _ in date_cols]  # 迟到
+        highlight_cols_n = [[] for _ in date_cols]  # 中午不打卡
+        highlight_cols_e = [[] for _ in date_cols]  # 早退
 
         attendance_issues = []
 
-        for i in range(c - 1):
-            highlight_rows_m = []
-            highlight_rows_n = []
-            highlight_rows_e = []
-
-            for j in range(r):
-                if df_original_for_display.iloc[j, 0] in name_list:
-                    if df_original_for_display.iloc[j, i + 1] == '':
-                        continue
-
-                    raw_time_str = str(df_original_for_display.iloc[j, i + 1])
-
-                    # 使用增强的时间解析
-                    time_list = parse_time_string(raw_time_str)
-                    valid_times = normalize_time_list(time_list)
-
-                    if len(valid_times) == 0:
-                        continue
-
-                    try:
-                        check_in_time = valid_times[0]
-                        check_out_time = valid_times[-1]
-                        morning_reference_time = datetime.strptime('10:00', '%H:%M')
-                        evening_reference_time = datetime.strptime('17:00', '%H:%M')
-                        check_times = len(valid_times)
-
-                        employee_name = df_original_for_display.iloc[j, 0]
-                        date_col = df_original_for_display.columns[i + 1]
-
-                        # 检测迟到
-                        if check_in_time.time() > morning_reference_time.time():
-                            highlight_rows_m.append(j)
-                            attendance_issues.append(
-                                f"迟到 - {employee_name}, {date_col}, 上班时间: {check_in_time.strftime('%H:%M')}")
-
-                        # 检测中午不打卡
-                        if check_times == 2:
-                            highlight_rows_n.append(j)
-                            attendance_issues.append(
-                                f"中午不打卡 - {employee_name}, {date_col}, 打卡次数: {check_times}")
-
-                        # 检测早退
-                        if check_out_time.time() < evening_reference_time.time():
-                            highlight_rows_e.append(j)
-                            attendance_issues.append(
-                                f"早退 - {employee_name}, {date_col}, 下班时间: {check_out_time.strftime('%H:%M')}")
-
-                    except Exception as e:
-                        print(f"⚠️ 考勤检测异常: 员工 {df_original_for_display.iloc[j, 0]}, 列 {i + 1}, 错误: {e}")
-                        continue
-
-            highlight_cols_m.append(highlight_rows_m)
-            highlight_cols_n.append(highlight_rows_n)
-            highlight_cols_e.append(highlight_rows_e)
+        for k in flagged.tolist():
+            j, i = int(cell_rows[k]), int(cell_cols[k])
+            employee_name = employee_names[j]
+            date_col = date_cols[i]
+
+            if late[k]:
+                highlight_cols_m[i].append(j)
+                attendance_issues.append(
+                    f"迟到 - {employee_name}, {date_col}, 上班时间: {format_minutes(int(metrics['first'][k]))}")
+
+            if no_lunch[k]:
+                highlight_cols_n[i].append(j)
+                attendance_issues.append(
+                    f"中午不打卡 - {employee_name}, {date_col}, 打卡次数: {int(metrics['counts'][k])}")
+
+            if early[k]:
+                highlight_cols_e[i].append(j)
+                attendance_issues.append(
+                    f"早退 - {employee_name}, {date_col}, 下班时间: {format_minutes(int(metrics['last'][k]))}")
 
         return {
             'highlight_cols_m': highlight_cols_m,
             'highlight_cols_n': highlight_cols_n,
             'highlight_cols_e': highlight_cols_e,
             'attendance_issues': attendance_issues,
+            'checked_cells': int(checked.sum()),
             'attendance_summary': {
-                'late_count': sum(len(rows) for rows in highlight_cols_m),
-                'no_lunch_count': sum(len(rows) for rows in highlight_cols_n),
-                'early_leave_count': sum(len(rows) for rows in highlight_cols_e)
+                'late_count': int(late.sum()),
+                'no_lunch_count': int(no_lunch.sum()),
+                'early_leave_count': int(early.sum())
             }
         }
 
     def _process_holidays(self, time_range, df_final):
-        """处理假期信息 - 修复类型错误"""
+        """处理假期信息：把落在假期的日期列重命名为假期名称"""
         try:
-            US_holidays = pd.DataFrame.from_dict(holidays.US(years=2022).items())
-            US_holidays.columns = ["date", "holiday_name"]
-            my_vacation = ["New Year's Day", "Independence Day", "Labor Day", "Thanksgiving", "Christmas Day"]
-
-            temp_list = []
-            for i in US_holidays['holiday_name']:
-                if i in my_vacation:
-                    x = US_holidays[US_holidays['holiday_name'] == i].index[0]
-                    temp_list.append(x)
-
-            my_vacation_date = list(US_holidays.iloc[temp_list, 0])
-
-            # 解析时间范围
-            time_str = time_range.split("-")
-            if len(time_str[0]) != len(time_str[1]):
-                year1 = time_str[0][:4]
-                start_day = time_str[0][-4:]
-                end_day = time_str[1][-4:]
-                start_date = datetime.strptime(year1 + start_day, '%Y%m%d').date()
-                end_date = datetime.strptime(year1 + end_day, '%Y%m%d').date()
-            else:
-                year1 = time_str[0][:4]
-                year2 = time_str[1][:4]
-                start_day = time_str[0][-4:]
-                end_day = time_str[1][-4:]
-                start_date = datetime.strptime(year1 + start_day, '%Y%m%d').date()
-                end_date = datetime.strptime(year2 + end_day, '%Y%m%d').date()
-
-            # 检查假期
-            holiday_column = None
-            for time in my_vacation_date:
-                if start_date < time < end_date:
-                    index = US_holidays[US_holidays['date'] == time].index[0]
-                    holiday = US_holidays.holiday_name[index]
-                    # 安全的列名检查和重命名
-                    day_num = time.day
-                    day_str = str(day_num)
-
-                    renamed = False
-                    # 检查所有可能的列名格式
-                    for col in df_final.columns:
-                        if str(col) == day_str or col == day_num:
-                            df_final = df_final.rename(columns={col: holiday})
-                            holiday_column = df_final.columns.get_loc(holiday)
-                            renamed = True
-                            break
-
-                    if renamed:
-                        print(f"📅 重命名假期列: {day_num} -> {holiday}")
-
-            return {'holiday_column': holiday_column, 'df_final': df_final}
+            start_date, end_date = parse_time_range(time_range)
+            period_holidays = dict(self.holiday_calendar.holidays_between(start_date, end_date))
+
+            # 日期列按顺序对应考勤周期内的日期，表头只有日号，按顺序推算完整日期（可跨月、跨年）
+            renames = {}
+            holiday_columns = []
+            day = start_date
+            for col_idx, col in enumerate(df_final.columns):
+                if not str(col).isdigit():
+                    continue
+                while day <= end_date and day.day != int(col):
+                    day += timedelta(days=1)
+                if day > end_date:
+                    break
+                holiday = period_holidays.get(day)
+                if holiday is not None:
+                    renames[col] = holiday
+                    holiday_columns.append(col_idx)
+                    logger.debug("📅 重命名假期列: %s -> %s", col, holiday)
+                day += timedelta(days=1)
+
+            if renames:
+                df_final = df_final.rename(columns=renames)
+            return {'holiday_columns': holiday_columns, 'df_final': df_final}
         except Exception as e:
-            print(f"⚠️ 假期处理失败: {e}")
-            return {'holiday_column': None, 'df_final': df_final}
+            logger.warning("⚠️ 假期处理失败: %s", e)
+            return {'holiday_columns': [], 'df_final': df_final}
 
     def _create_excel_report_enhanced(self, df_final, df_original_for_display, attendance_result,
                                       problematic_cells_with_details, original_date_cols,
-                                      output_path, holiday_result, processing_stats):
-        """创建增强的Excel报告 - 修复行列对齐"""
-        workbook = Workbook()
-        workbook.remove(workbook.active)
+                                      output_path, holiday_result, processing_stats, stage_timings=None):
+        """创建增强的Excel报告 - 只写模式逐行写出，样式和注释在写入时附加"""
+        workbook = Workbook(write_only=True)
+        report_styles = self._build_report_styles(df_final, attendance_result,
+                                                  problematic_cells_with_details, original_date_cols,
+                                                  holiday_result)
 
         # 创建工作表
-        sheet_names = ["时间汇总", "迟到", "中午不打卡", "早退", "处理日志"]
-        sheets_data = [df_final, df_original_for_display, df_original_for_display, df_original_for_display, None]
+        sheet_names = ["时间汇总", "迟到", "中午不打卡", "早退"]
+        sheets_data = [df_final, df_original_for_display, df_original_for_display, df_original_for_display]
 
-        for i, (sheet_name, data) in enumerate(zip(sheet_names, sheets_data)):
-            ws = workbook.create_sheet(title=sheet_name)
+        # 列宽直接由DataFrame向量化计算，同一数据源只计算一次
+        widths_by_data = {}
 
-            if data is not None:
-                print(f"📝 写入工作表 '{sheet_name}', 形状: {data.shape}")
-                for r_idx, row in enumerate(dataframe_to_rows(data, index=False, header=True), 1):
-                    for c_idx, value in enumerate(row, 1):
-                        ws.cell(row=r_idx, column=c_idx, value=value)
-            else:
-                # 处理日志工作表
-                self._create_log_sheet(ws, processing_stats, attendance_result, problematic_cells_with_details)
+        for sheet_name, data in zip(sheet_names, sheets_data):
+            logger.debug("📝 写入工作表 '%s', 形状: %s", sheet_name, data.shape)
+            if id(data) not in widths_by_data:
+                widths_by_data[id(data)] = self._measure_dataframe_widths(data)
+            rows = chain([list(data.columns)], data.itertuples(index=False, name=None))
+            self._write_report_sheet(workbook, sheet_name, rows, widths_by_data[id(data)],
+                                     report_styles[sheet_name])
 
-        # 应用样式
-        print("🎨 应用Excel样式和高亮...")
-        self._apply_enhanced_styles_fixed(workbook, df_final, attendance_result,
-                                          problematic_cells_with_details, original_date_cols,
-                                          holiday_result)
+        # 处理日志工作表
+        self._create_log_sheet(workbook, processing_stats, attendance_result, problematic_cells_with_details,
+                               stage_timings)
 
         workbook.save(output_path)
         workbook.close()
-        print(f"📁 Excel文件已保存: {output_path}")
-
-    def _apply_enhanced_styles_fixed(self, workbook, df_final, attendance_result,
-                                     problematic_cells_with_details, original_date_cols,
-                                     holiday_result):
-        """修复的高亮样式应用方法"""
+        logger.debug("📁 Excel文件已保存: %s", output_path)
+
+    def _build_report_styles(self, df_final, attendance_result, problematic_cells_with_details,
+                             original_date_cols, holiday_result):
+        """
+        预先计算各工作表的高亮样式
+        返回 {工作表名: 单元格样式}，单元格样式 key 为 (行索引, 列索引)，value 为 (填充, 注释)
+        行索引0为标题行，索引均从0开始
+        """
         # 定义颜色
         yellow_fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
         red_fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
         green_fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-        log_header_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
 
-        print("🎨 处理时间汇总工作表...")
-        sheet1 = workbook["时间汇总"]
+        report_styles = {}
 
-        # 高亮统计列（最后6列）
+        logger.debug("🎨 处理时间汇总工作表...")
+        # 高亮统计列（最后6列）、员工姓名列和假期列
+        cell_styles = {}
         total_cols = len(df_final.columns)
-        metrics_start = total_cols - 6
-        for i in range(metrics_start, total_cols):
-            cell = sheet1.cell(row=1, column=i + 1)
-            cell.fill = yellow_fill
-            print(f"   ✅ 统计列高亮: 列{i + 1}")
-
-        # 高亮员工姓名列
-        sheet1.cell(row=1, column=1).fill = red_fill
-
-        # 高亮假期列
-        if holiday_result['holiday_column'] is not None:
-            sheet1.cell(row=1, column=holiday_result['holiday_column'] + 1).fill = green_fill
+        for i in range(total_cols - 6, total_cols):
+            cell_styles[(0, i)] = (yellow_fill, None)
+        cell_styles[(0, 0)] = (red_fill, None)
+        for col_idx in holiday_result['holiday_columns']:
+            cell_styles[(0, col_idx)] = (green_fill, None)
 
         # 高亮问题数据单元格（只在原始时间列中）
+        problem_fills = {}
         problem_count = 0
-        for cell_key, anomaly_info in problematic_cells_with_details.items():
-            row_idx, col_idx = cell_key
-
-            # 确保只在原始时间列中高亮
-            if col_idx <= original_date_cols:
-                try:
-                    excel_row = row_idx + 2  # +2 因为Excel从1开始且有标题行
-                    excel_col = col_idx + 1  # +1 因为Excel从1开始
+        for (row_idx, col_idx), anomaly_info in problematic_cells_with_details.items():
+            if col_idx > original_date_cols:
+                continue
 
-                    cell = sheet1.cell(row=excel_row, column=excel_col)
+            # 根据异常类型选择颜色
+            color = anomaly_info.get('color', 'FF0000')
+            if color not in problem_fills:
+                problem_fills[color] = PatternFill(start_color=color, end_color=color, fill_type='solid')
 
-                    # 根据异常类型选择颜色
-                    color = anomaly_info.get('color', 'FF0000')
-                    problem_fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-                    cell.fill = problem_fill
+            # 注释内容
+            comment_text = f"异常类型: {anomaly_info['type']}\n"
+            comment_text += f"描述: {anomaly_info['description']}\n"
+            comment_text += f"员工: {anomaly_info['employee']}\n"
+            comment_text += f"原始值: {anomaly_info['raw_value']}"
 
-                    # 添加注释
-                    comment_text = f"异常类型: {anomaly_info['type']}\n"
-                    comment_text += f"描述: {anomaly_info['description']}\n"
-                    comment_text += f"员工: {anomaly_info['employee']}\n"
-                    comment_text += f"原始值: {anomaly_info['raw_value']}"
+            if 'work_hours' in anomaly_info:
+                comment_text += f"\n计算工时: {anomaly_info['work_hours']}h"
 
-                    if 'work_hours' in anomaly_info:
-                        comment_text += f"\n计算工时: {anomaly_info['work_hours']}h"
+            cell_styles[(row_idx + 1, col_idx)] = (problem_fills[color], comment_text)
+            problem_count += 1
 
-                    cell.comment = Comment(comment_text, "系统检测")
-
-                    problem_count += 1
-                    print(f"   ✅ 高亮问题单元格: 行{excel_row}, 列{excel_col}, 类型: {anomaly_info['type']}")
-
-                except Exception as e:
-                    print(f"   ❌ 高亮失败: {cell_key}, 错误: {e}")
-
-        print(f"📊 时间汇总工作表: 共高亮 {problem_count} 个问题单元格")
+        logger.debug("📊 时间汇总工作表: 共高亮 %d 个问题单元格", problem_count)
+        report_styles["时间汇总"] = cell_styles
 
         # 处理考勤工作表
         attendance_sheets = [
@@ -754,63 +862,80 @@ class TimecardProcessor:
         ]
 
         for sheet_name, highlight_cols in attendance_sheets:
-            print(f"🎨 处理{sheet_name}工作表...")
-            sheet = workbook[sheet_name]
-
-            # 高亮标题
-            sheet.cell(row=1, column=1).fill = red_fill
-
-            # 高亮考勤问题单元格
+            logger.debug("🎨 处理%s工作表...", sheet_name)
+            # 高亮标题和考勤问题单元格，第一列是姓名列
+            cell_styles = {(0, 0): (red_fill, None)}
             attendance_count = 0
             for col_idx, rows in enumerate(highlight_cols):
                 for row_idx in rows:
-                    try:
-                        excel_row = row_idx + 2  # +2 因为Excel从1开始且有标题行
-                        excel_col = col_idx + 2  # +2 因为第一列是姓名列，Excel从1开始
-
-                        cell = sheet.cell(row=excel_row, column=excel_col)
-                        cell.fill = red_fill
-
-                        # 添加考勤问题注释
-                        cell.comment = Comment(f"{sheet_name} - 需要关注", "系统检测")
-                        attendance_count += 1
-
-                    except Exception as e:
-                        print(f"   ❌ 考勤高亮失败: 行{row_idx}, 列{col_idx}, 错误: {e}")
-
-            print(f"📊 {sheet_name}工作表: 共高亮 {attendance_count} 个考勤问题")
-
-        # 处理日志工作表样式
-        print("🎨 处理日志工作表...")
-        log_sheet = workbook["处理日志"]
+                    cell_styles[(row_idx + 1, col_idx + 1)] = (red_fill, f"{sheet_name} - 需要关注")
+                    attendance_count += 1
+
+            logger.debug("📊 %s工作表: 共高亮 %d 个考勤问题", sheet_name, attendance_count)
+            report_styles[sheet_name] = cell_styles
+
+        return report_styles
+
+    @staticmethod
+    def _column_width(max_length):
+        """由最长文本长度得到合适的列宽"""
+        return max(min((max_length + 2) * 1.2, 50), 10)
+
+    def _measure_column_widths(self, rows):
+        """根据将要写入的少量行计算列宽"""
+        max_lengths = []
+        for row in rows:
+            if len(row) > len(max_lengths):
+                max_lengths.extend([0] * (len(row) - len(max_lengths)))
+            for c_idx, value in enumerate(row):
+                if value and len(str(value)) > max_lengths[c_idx]:
+                    max_lengths[c_idx] = len(str(value))
+
+        return [self._column_width(max_length) for max_length in max_lengths]
+
+    def _measure_dataframe_widths(self, data):
+        """按列向量化计算DataFrame（含标题行）写入后的列宽，空值、0和False不计入"""
+        widths = []
+        for column_name, column in data.items():
+            max_length = len(str(column_name)) if column_name else 0
+
+            if len(column):
+                text = column.astype(str)
+                falsy = column.isin([0, '']) | (column.isna() & (text == 'None'))
+                lengths = text[~falsy].str.len()
+                if len(lengths):
+                    max_length = max(max_length, int(lengths.max()))
+
+            widths.append(self._column_width(max_length))
+        return widths
+
+    def _write_report_sheet(self, workbook, sheet_name, rows, widths, cell_styles):
+        """向只写工作簿逐行写出一个工作表，高亮和注释随行附加"""
+        ws = workbook.create_sheet(title=sheet_name)
+
+        # 只写模式下列宽必须在写入第一行之前设置
+        for c_idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(c_idx)].width = width
+
+        styles_by_row = {}
+        for (r_idx, c_idx), style in cell_styles.items():
+            styles_by_row.setdefault(r_idx, []).append((c_idx, style))
+
+        for r_idx, row in enumerate(rows):
+            row_styles = styles_by_row.get(r_idx)
+            if row_styles:
+                row = list(row)
+                for c_idx, (fill, comment_text) in row_styles:
+                    cell = WriteOnlyCell(ws, value=row[c_idx])
+                    cell.fill = fill
+                    if comment_text:
+                        cell.comment = Comment(comment_text, "系统检测")
+                    row[c_idx] = cell
+            ws.append(row)
 
-        # 高亮标题行
-        for row in range(1, log_sheet.max_row + 1):
-            cell = log_sheet.cell(row=row, column=1)
-            if cell.value and isinstance(cell.value, str) and ('统计' in cell.value or '说明' in cell.value):
-                cell.fill = log_header_fill
-                log_sheet.cell(row=row, column=2).fill = log_header_fill
-
-        # 自动调整列宽
-        print("📐 自动调整列宽...")
-        for sheet in workbook.worksheets:
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if cell.value and len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                # 设置合适的列宽
-                adjusted_width = min((max_length + 2) * 1.2, 50)
-                sheet.column_dimensions[column_letter].width = max(adjusted_width, 10)
-
-        print("✅ 所有样式应用完成")
-
-    def _create_log_sheet(self, ws, processing_stats, attendance_result, problematic_cells_with_details):
-        """创建处理日志工作表"""
+    def _create_log_sheet(self, workbook, processing_stats, attendance_result, problematic_cells_with_details,
+                          stage_timings=None):
+        """创建处理日志工作表，stage_timings为StageTimer记录的各阶段耗时"""
         log_data = [
             ["处理统计", ""],
             ["总单元格数", processing_stats['total_cells']],
@@ -852,7 +977,25 @@ class TimecardProcessor:
             for anomaly_type, count in anomaly_stats.items():
                 log_data.append([anomaly_type, count])
 
-        # 写入数据
-        for r_idx, row in enumerate(log_data, 1):
-            for c_idx, value in enumerate(row, 1):
-                ws.cell(row=r_idx, column=c_idx, value=value)
\ No newline at end of file
+        # 添加阶段耗时
+        if stage_timings:
+            log_data.extend([["", ""], ["阶段耗时统计", ""]])
+            for stage in stage_timings:
+                detail = f"{stage['seconds']:.3f}s"
+                if stage['cells'] is not None:
+                    detail += f", {stage['cells']}个单元格"
+                if stage.get('rss_mb') is not None:
+                    detail += f", 内存{stage['rss_mb']}MB（{stage['rss_delta_mb']:+.1f}MB）"
+                log_data.append([stage['stage'], detail])
+
+        # 高亮标题行
+        log_header_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
+        cell_styles = {}
+        for r_idx, row in enumerate(log_data):
+            if row[0] and isinstance(row[0], str) and ('统计' in row[0] or '说明' in row[0]):
+                cell_styles[(r_idx, 0)] = (log_header_fill, None)
+                cell_styles[(r_idx, 1)] = (log_header_fill, None)
+
+        logger.debug("🎨 处理日志工作表...")
+        widths = self._measure_column_widths(log_data)
+        self._write_report_sheet(workbook, "处理日志", log_data, widths, cell_styles)
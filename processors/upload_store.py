@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+import zipfile
+
+# xlsx为zip包，xls为OLE2复合文档
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_SHEET_TAG = re.compile(rb'<(?:\w+:)?sheet\b')
+
+
+class UploadError(Exception):
+    """上传内容不合法，status为返回给客户端的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def upload_filename(original_name, prefix=''):
+    """生成保存用的文件名：uuid + 前缀 + 原始文件名（去掉路径部分）"""
+    return str(uuid.uuid4()) + '_' + prefix + os.path.basename(original_name.replace('\\', '/'))
+
+
+def check_excel_name(original_name):
+    if not original_name or not original_name.endswith(('.xlsx', '.xls')):
+        raise UploadError('请选择Excel文件')
+
+
+class _ExcelStreamChecker:
+    """边写边检查：计算sha256、统计大小并校验文件头"""
+
+    def __init__(self, original_name, max_bytes, digest=None, size=0):
+        self.expected = XLSX_SIGNATURE if original_name.endswith('.xlsx') else XLS_SIGNATURE
+        self.max_bytes = max_bytes
+        self.digest = digest or hashlib.sha256()
+        self.size = size
+
+    def update(self, chunk):
+        if self.size < len(self.expected):
+            head = chunk[:len(self.expected) - self.size]
+            if head != self.expected[self.size:self.size + len(head)]:
+                raise UploadError('文件内容不是有效的Excel文件')
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadError('文件过大', 413)
+        self.digest.update(chunk)
+
+
+def _copy_stream(stream, f, checker, chunk_size):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        checker.update(chunk)
+        f.write(chunk)
+
+
+def count_sheets(file_path):
+    """
+    统计xlsx中的工作表数量：只读取zip目录和xl/workbook.xml，不解压工作表数据
+    xls返回None
+    """
+    if not zipfile.is_zipfile(file_path):
+        return None
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            return len(_SHEET_TAG.findall(archive.read('xl/workbook.xml')))
+    except (KeyError, zipfile.BadZipFile):
+        raise UploadError('文件内容不是有效的Excel文件')
+
+
+def _finish_upload(file_path, original_name, checker):
+    """检查写入完成的文件，返回上传信息；不合法时删除文件"""
+    try:
+        if checker.size < len(checker.expected):
+            raise UploadError('文件内容不是有效的Excel文件')
+        sheet_count = count_sheets(file_path)
+        if sheet_count == 0:
+            raise UploadError('Excel文件中没有工作表')
+    except UploadError:
+        os.remove(file_path)
+        raise
+    return {
+        'path': file_path,
+        'size': checker.size,
+        'sha256': checker.digest.hexdigest(),
+        'sheet_count': sheet_count,
+        'original_name': original_name
+    }
+
+
+def save_stream(stream, file_path, original_name, max_bytes=None, chunk_size=1024 * 1024):
+    """
+    把上传数据流分块直接写入目标文件，同时计算sha256并校验Excel文件头
+    返回 {'path', 'size', 'sha256', 'sheet_count', 'original_name'}，内容不合法时抛出UploadError
+    目标目录在文件名检查通过后才创建
+    """
+    check_excel_name(original_name)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    checker = _ExcelStreamChecker(original_name, max_bytes)
+    try:
+        with open(file_path, 'wb') as f:
+            _copy_stream(stream, f, checker, chunk_size)
+    except UploadError:
+        os.remove(file_path)
+        raise
+    return _finish_upload(file_path, original_name, checker)
+
+
+class UploadSessions:
+    """
+    可续传的分块上传
+    每个会话在sessions_folder下保存 <id>.part（已接收的数据）和 <id>.json（目标位置和大小）；
+    客户端按offset顺序追加分块，中断后查询已接收的offset继续上传，全部接收后移动到目标位置
+    """
+
+    def __init__(self, sessions_folder, max_bytes=None, chunk_size=1024 * 1024):
+        self.sessions_folder = sessions_folder
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._checkers = {}  # 会话ID -> 增量哈希状态（服务重启后从已接收数据重新计算）
+        self._session_locks = {}  # 会话ID -> 锁，同一会话的分块依次写入，不同会话互不阻塞
+        self._lock = threading.Lock()
+        os.makedirs(sessions_folder, exist_ok=True)
+
+    def _paths(self, upload_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id or ''):
+            raise UploadError('上传会话不存在', 404)
+        base = os.path.join(self.sessions_folder, upload_id)
+        return base + '.part', base + '.json'
+
+    def _load(self, upload_id):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except OSError:
+            raise UploadError('上传会话不存在', 404)
+        meta['received'] = os.path.getsize(part_path)
+        return meta
+
+    def create(self, original_name, total_size, target_folder, prefix=''):
+        """创建上传会话，返回会话信息"""
+        check_excel_name(original_name)
+        if total_size <= 0:
+            raise UploadError('文件大小无效')
+        if self.max_bytes and total_size > self.max_bytes:
+            raise UploadError('文件过大', 413)
+
+        os.makedirs(target_folder, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        meta = {
+            'upload_id': upload_id,
+            'original_name': original_name,
+            'filename': upload_filename(original_name, prefix),
+            'target_folder': target_folder,
+            'total_size': total_size
+        }
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        meta['received'] = 0
+        return meta
+
+    def status(self, upload_id):
+        return self._load(upload_id)
+
+    def _checker(self, upload_id, meta, part_path):
+        checker = self._checkers.get(upload_id)
+        if checker is None or checker.size != meta['received']:
+            checker = _ExcelStreamChecker(meta['original_name'], meta['total_size'])
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    checker.update(chunk)
+            self._checkers[upload_id] = checker
+        return checker
+
+    def _session_lock(self, upload_id):
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def _forget(self, upload_id):
+        with self._lock:
+            self._checkers.pop(upload_id, None)
+            self._session_locks.pop(upload_id, None)
+
+    def append(self, upload_id, offset, stream):
+        """
+        从offset处追加一个分块；offset必须等于已接收的大小，否则抛出409并由客户端按status重新定位
+        全部接收后完成上传，返回的会话信息包含 'complete' 和上传结果
+        """
+        part_path, meta_path = self._paths(upload_id)
+        with self._session_lock(upload_id):
+            meta = self._load(upload_id)
+            if offset != meta['received']:
+                raise UploadError(f"分块位置不匹配，已接收 {meta['received']} 字节", 409)
+
+            checker = self._checker(upload_id, meta, part_path)
+            try:
+                with open(part_path, 'ab') as f:
+                    _copy_stream(stream, f, checker, self.chunk_size)
+            except UploadError:
+                # 丢弃本次分块中已写入的部分，保留之前接收的数据
+                self._checkers.pop(upload_id, None)
+                with open(part_path, 'ab') as f:
+                    f.truncate(meta['received'])
+                raise
+
+            meta['received'] = checker.size
+            meta['complete'] = checker.size == meta['total_size']
+            if not meta['complete']:
+                return meta
+
+            # 上传期间空的目标目录可能已被存储清理删除
+            os.makedirs(meta['target_folder'], exist_ok=True)
+            file_path = os.path.join(meta['target_folder'], meta['filename'])
+            os.replace(part_path, file_path)
+            os.remove(meta_path)
+            self._forget(upload_id)
+            meta['result'] = _finish_upload(file_path, meta['original_name'], checker)
+            return meta
+
+    def cancel(self, upload_id):
+        paths = self._paths(upload_id)
+        with self._session_lock(upload_id):
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        self._forget(upload_id)
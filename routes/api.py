@@ -1,53 +1,243 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, current_app, request, jsonify, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import get_input_stream
+from datetime import date
+import logging
 import os
-import uuid
-from processors.timecard_processor import TimecardProcessor
+import threading
+import time
+from processors.job_queue import JobQueue
+from processors.result_cache import ResultCache
+from processors.storage_manager import StorageManager
+from processors.upload_store import UploadError, UploadSessions, save_stream, upload_filename
+from utils.holiday_calendar import HolidayCalendar
+from utils.time_utils import analysis_cache_stats
 
 api = Blueprint('api', __name__)
+logger = logging.getLogger(__name__)
+
+# 应用级共享资源在app.extensions中的键
+EXTENSION_KEY = 'timecard'
+
+def init_app(app):
+    """
+    启动时创建长期存在的共享资源并注册到app.extensions：
+    处理器（持有结果缓存、假期日历和并行进程池）、后台任务队列、存储管理（任务目录和定期清理）
+    处理器不保存单次请求的状态，各缓存自带锁，可在多个请求线程间共享；
+    处理器依赖pandas/openpyxl，在首次处理请求或warm_up时才导入和创建，健康检查不需要等待
+    """
+    result_cache = None
+    if app.config['RESULT_CACHE_ENABLED']:
+        result_cache = ResultCache(app.config['RESULT_CACHE_FOLDER'], app.config['RESULT_CACHE_MAX_BYTES'])
+
+    holiday_calendar = HolidayCalendar(app.config['HOLIDAY_COUNTRY'], app.config['HOLIDAY_NAMES'],
+                                       app.config['COMPANY_HOLIDAYS'],
+                                       preload_years=app.config['HOLIDAY_PRELOAD_YEARS'])
+
+    app.extensions[EXTENSION_KEY] = {
+        'processor': None,
+        'processor_lock': threading.Lock(),
+        'warm_up_seconds': None,
+        'job_queue': JobQueue(app.config['JOB_WORKERS'], app.config['JOB_HISTORY_LIMIT'],
+                              app.config['JOB_STATE_FOLDER']),
+        'result_cache': result_cache,
+        'holiday_calendar': holiday_calendar,
+        'upload_sessions': UploadSessions(app.config['UPLOAD_SESSIONS_FOLDER'], app.config['UPLOAD_MAX_BYTES'],
+                                          app.config['UPLOAD_CHUNK_SIZE']),
+        'storage': StorageManager([app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER']],
+                                  [app.config['UPLOAD_SESSIONS_FOLDER'], app.config['JOB_STATE_FOLDER']],
+                                  app.config['STORAGE_TTL_SECONDS'], app.config['STORAGE_MAX_BYTES'],
+                                  app.config['STORAGE_MIN_AGE_SECONDS'], app.config['STORAGE_SWEEP_INTERVAL'])
+    }
+    return app.extensions[EXTENSION_KEY]
+
+def shutdown_resources(app):
+    """停止接收后台任务、停止存储清理并关闭进程池"""
+    resources = app.extensions.get(EXTENSION_KEY)
+    if resources is None:
+        return
+    resources['job_queue'].shutdown()
+    resources['storage'].stop()
+    if resources['processor'] is not None:
+        resources['processor'].close()
+
+def get_resources():
+    """当前应用的共享资源"""
+    return current_app.extensions[EXTENSION_KEY]
+
+def _ensure_processor(app):
+    """创建共享处理器（首次调用时导入pandas、openpyxl等处理依赖）"""
+    resources = app.extensions[EXTENSION_KEY]
+    with resources['processor_lock']:
+        if resources['processor'] is None:
+            from processors.timecard_processor import TimecardProcessor
+            resources['processor'] = TimecardProcessor(
+                app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'],
+                app.config['PROCESSING_WORKERS'], app.config['EXCEL_READER'],
+                resources['result_cache'], resources['holiday_calendar'], app.config['ATTENDANCE_RULES']
+            )
+        return resources['processor']
+
+def warm_up(app):
+    """预热：导入处理依赖、创建处理器并构建当年的假期索引，可在后台线程中调用"""
+    resources = app.extensions[EXTENSION_KEY]
+    started = time.perf_counter()
+    _ensure_processor(app)
+    resources['holiday_calendar'].holiday_name(date.today())
+    resources['warm_up_seconds'] = round(time.perf_counter() - started, 3)
+    logger.info("🔥 预热完成: %.2fs", resources['warm_up_seconds'])
 
 def get_processor():
-    """获取处理器实例"""
-    from app import app
-    return TimecardProcessor(app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'])
+    """获取共享的处理器实例"""
+    return _ensure_processor(current_app)
 
-@api.route('/upload', methods=['POST'])
-def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': '没有选择文件'}), 400
+def get_job_queue():
+    """获取后台任务队列"""
+    return get_resources()['job_queue']
 
-    file = request.files['file']
-    if file.filename == '' or not file.filename.endswith(('.xlsx', '.xls')):
-        return jsonify({'error': '请选择Excel文件'}), 400
+def get_storage():
+    """获取存储管理"""
+    return get_resources()['storage']
+
+def submit_job(kind, func, *args, **kwargs):
+    """提交后台任务，立即返回任务ID和状态查询地址"""
+    job_id = get_job_queue().submit(kind, func, *args, **kwargs)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+def _upload_target(kind, job_id=None):
+    """
+    上传类型对应的保存目录（任务目录）和文件名前缀：timecard为原始表，保存到新的任务目录；
+    error为修改后的错误表格，保存到job_id对应的处理结果任务目录（未指定时新建）
+    目录在开始写入时才创建，被拒绝的请求不留下空目录
+    """
+    storage = get_storage()
+    if kind == 'error':
+        if not storage.is_job_id(job_id):
+            job_id = storage.new_job_id()
+        return storage.job_dir(current_app.config['PROCESSED_FOLDER'], job_id, create=False), 'error_'
+    return storage.job_dir(current_app.config['UPLOAD_FOLDER'], storage.new_job_id(), create=False), ''
 
-    filename = str(uuid.uuid4()) + '_' + file.filename
-    file_path = os.path.join(get_processor().upload_folder, filename)
-    file.save(file_path)
+def _discard_empty(folder):
+    """上传失败时删除新建的空任务目录"""
+    try:
+        os.rmdir(folder)
+    except OSError:
+        pass
 
+def _upload_response(info):
+    """上传完成：记录边写边计算的哈希供结果缓存使用，返回文件信息（文件名包含任务目录）"""
+    result_cache = get_resources()['result_cache']
+    if result_cache is not None:
+        result_cache.record_digest(info['path'], info['sha256'])
+    job_id = os.path.basename(os.path.dirname(info['path']))
     return jsonify({
         'success': True,
-        'filename': filename,
-        'original_name': file.filename
+        'filename': f"{job_id}/{os.path.basename(info['path'])}",
+        'job_id': job_id,
+        'original_name': info['original_name'],
+        'size': info['size'],
+        'sha256': info['sha256'],
+        'sheet_count': info['sheet_count']
     })
 
-@api.route('/upload/error', methods=['POST'])
-def upload_error_file():
+def _save_uploaded_file(kind):
+    """保存multipart表单中的文件，分块写入并同时计算哈希和校验"""
     if 'file' not in request.files:
         return jsonify({'error': '没有选择文件'}), 400
 
     file = request.files['file']
-    if file.filename == '' or not file.filename.endswith(('.xlsx', '.xls')):
-        return jsonify({'error': '请选择Excel文件'}), 400
+    folder, prefix = _upload_target(kind, request.form.get('job'))
+    file_path = os.path.join(folder, upload_filename(file.filename, prefix))
+    try:
+        info = save_stream(file.stream, file_path, file.filename, chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'])
+    except UploadError as e:
+        _discard_empty(folder)
+        return jsonify({'error': str(e)}), e.status
+    return _upload_response(info)
 
-    filename = str(uuid.uuid4()) + '_error_' + file.filename
-    file_path = os.path.join(get_processor().processed_folder, filename)
-    file.save(file_path)
+@api.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({'error': '文件过大'}), 413
 
+@api.route('/upload', methods=['POST'])
+def upload_file():
+    return _save_uploaded_file('timecard')
+
+@api.route('/upload/error', methods=['POST'])
+def upload_error_file():
+    return _save_uploaded_file('error')
+
+@api.route('/upload/stream', methods=['PUT'])
+def upload_stream():
+    """
+    请求体即文件内容，不经过表单解析和临时文件，直接写入目标位置
+    直接读取WSGI输入流，请求体上限为UPLOAD_MAX_BYTES（request.stream受MAX_CONTENT_LENGTH限制）
+    """
+    original_name = request.args.get('filename', '')
+    stream = get_input_stream(request.environ, max_content_length=current_app.config['UPLOAD_MAX_BYTES'])
+    folder, prefix = _upload_target(request.args.get('kind'), request.args.get('job'))
+    file_path = os.path.join(folder, upload_filename(original_name, prefix))
+    try:
+        info = save_stream(stream, file_path, original_name, current_app.config['UPLOAD_MAX_BYTES'],
+                           current_app.config['UPLOAD_CHUNK_SIZE'])
+    except UploadError as e:
+        _discard_empty(folder)
+        return jsonify({'error': str(e)}), e.status
+    return _upload_response(info)
+
+def _session_response(session):
+    if session.get('complete'):
+        return _upload_response(session['result'])
     return jsonify({
         'success': True,
-        'filename': filename,
-        'original_name': file.filename
+        'upload_id': session['upload_id'],
+        'received': session['received'],
+        'total_size': session['total_size'],
+        'complete': False
     })
 
+@api.route('/upload/sessions', methods=['POST'])
+def create_upload_session():
+    """创建可续传的分块上传会话，参数: filename, size, kind, job"""
+    data = request.json or {}
+    try:
+        size = int(data.get('size') or 0)
+    except (TypeError, ValueError):
+        return jsonify({'error': '文件大小无效'}), 400
+    folder, prefix = _upload_target(data.get('kind'), data.get('job'))
+    try:
+        session = get_resources()['upload_sessions'].create(data.get('filename', ''), size, folder, prefix)
+    except UploadError as e:
+        _discard_empty(folder)
+        return jsonify({'error': str(e)}), e.status
+    return _session_response(session), 201
+
+@api.route('/upload/sessions/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_session(upload_id):
+    """
+    GET: 查询已接收的字节数，用于中断后续传
+    PUT: 请求体为从offset开始的分块，offset通过查询参数传入
+    DELETE: 取消上传
+    """
+    sessions = get_resources()['upload_sessions']
+    try:
+        if request.method == 'GET':
+            return _session_response(sessions.status(upload_id))
+        if request.method == 'DELETE':
+            sessions.cancel(upload_id)
+            return jsonify({'success': True})
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': '缺少offset参数'}), 400
+        return _session_response(sessions.append(upload_id, offset, request.stream))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
 @api.route('/process/step1', methods=['POST'])
 def process_step1():
     data = request.json
@@ -55,12 +245,22 @@ def process_step1():
     if not filename:
         return jsonify({'error': '缺少文件名'}), 400
 
-    file_path = os.path.join(get_processor().upload_folder, filename)
-    if not os.path.exists(file_path):
+    processor = get_processor()
+    file_path = safe_join(processor.upload_folder, filename)
+    if file_path is None or not os.path.isfile(file_path):
         return jsonify({'error': '文件不存在'}), 404
 
-    processor = get_processor()
-    result = processor.process_step1(file_path)
+    # 输出到与上传文件同名的任务目录；旧版平铺存放的上传文件使用新的任务目录
+    storage = get_storage()
+    job_id = os.path.dirname(filename)
+    if not storage.is_job_id(job_id):
+        job_id = storage.new_job_id()
+    output_folder = storage.job_dir(processor.processed_folder, job_id)
+
+    if data.get('async'):
+        return submit_job('step1', processor.process_step1, file_path, output_folder=output_folder)
+
+    result = processor.process_step1(file_path, output_folder=output_folder)
     return jsonify(result)
 
 @api.route('/process/step2', methods=['POST'])
@@ -72,26 +272,55 @@ def process_step2():
     if not error_filename or not time_range:
         return jsonify({'error': '缺少必要参数'}), 400
 
-    error_file_path = os.path.join(get_processor().processed_folder, error_filename)
-    if not os.path.exists(error_file_path):
+    processor = get_processor()
+    error_file_path = safe_join(processor.processed_folder, error_filename)
+    if error_file_path is None or not os.path.isfile(error_file_path):
         return jsonify({'error': '中间文件不存在'}), 404
 
-    processor = get_processor()
-    result = processor.process_step2(error_file_path, time_range)
+    # 最终报告与错误表格输出在同一任务目录
+    output_folder = os.path.dirname(error_file_path)
+    if data.get('async'):
+        return submit_job('step2', processor.process_step2, error_file_path, time_range,
+                          output_folder=output_folder)
+
+    result = processor.process_step2(error_file_path, time_range, output_folder=output_folder)
     return jsonify(result)
 
-@api.route('/download/<filename>')
+@api.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job)
+
+@api.route('/download/<path:filename>')
 def download_file(filename):
-    file_path = os.path.join(get_processor().processed_folder, filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True, download_name=filename)
+    """filename为处理结果中的output_file（任务目录/文件名）"""
+    file_path = safe_join(current_app.config['PROCESSED_FOLDER'], filename)
+    if file_path is not None and os.path.isfile(file_path):
+        return send_file(file_path, as_attachment=True, download_name=os.path.basename(filename))
     return jsonify({'error': '文件不存在'}), 404
 
+@api.route('/storage')
+def storage_usage():
+    """上传和处理结果目录的占用情况、清理配置和最近一次清理结果"""
+    return jsonify(get_storage().usage())
+
+@api.route('/storage/sweep', methods=['POST'])
+def storage_sweep():
+    """立即执行一次清理"""
+    return jsonify(get_storage().sweep())
+
 @api.route('/status')
 def status():
-    processor = get_processor()
+    resources = get_resources()
+    result_cache = resources['result_cache']
     return jsonify({
         'status': 'running',
-        'upload_folder': processor.upload_folder,
-        'processed_folder': processor.processed_folder
+        'upload_folder': current_app.config['UPLOAD_FOLDER'],
+        'processed_folder': current_app.config['PROCESSED_FOLDER'],
+        'processor_ready': resources['processor'] is not None,
+        'warm_up_seconds': resources['warm_up_seconds'],
+        'result_cache': result_cache.stats() if result_cache else None,
+        'analysis_cache': analysis_cache_stats()
     }) 
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+openpyxl流式读取和XML直接解析必须与pd.read_excel（pandas读取方式）得到完全相同的布局数据，
+包括各列的类型推断（数值列、空值文本转NaN、不规则行）
+用法: python -m pytest tests/test_excel_reader.py
+"""
+import glob
+import math
+import numbers
+import os
+from datetime import date, datetime, time
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from benchmarks.timecard_generator import generate_timecard
+from utils.excel_reader import NA_STRINGS, TIMECARD_READERS, read_timecard
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_UPLOADS = sorted(glob.glob(os.path.join(ROOT, 'uploads', '*.xlsx')))[:3]
+
+
+def _normalize(value):
+    """按类型和值比较：int与float、NaN、日期时间分别区分"""
+    if isinstance(value, bool):
+        return ('bool', value)
+    if isinstance(value, numbers.Integral):
+        return ('int', int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return ('nan',) if math.isnan(value) else ('float', value)
+    if isinstance(value, datetime):
+        return ('datetime', pd.Timestamp(value))
+    return (type(value).__name__, value)
+
+
+def _layout(result):
+    return {
+        'shape': tuple(result['shape']),
+        'period': _normalize(result['period']),
+        'date_row': [_normalize(value) for value in result['date_row']],
+        'names': [_normalize(value) for value in result['names']],
+        'punches': [[_normalize(value) for value in row] for row in result['punches']]
+    }
+
+
+def _edge_case_workbook(path):
+    """
+    覆盖类型推断的特殊情况：数字姓名、时间/日期/数字单元格、'NA'等空值文本、
+    长短不一的行，以及最后一名员工后没有日期行
+    """
+    workbook = Workbook()
+    sheet = workbook.active
+    date_row = [13, 14, 15, 16, 17]
+    sheet.append(['List of Logs'])
+    sheet.append([])
+    sheet.append(['Period : ', None, '2025/07/13 ~ 07/17'])
+    sheet.append(date_row)
+
+    names = [12345, 'NA', '员工C', 678.5]
+    punch_rows = [
+        ['09:00\n18:00', time(9, 30), None, 'NA', 8],
+        [datetime(2025, 7, 14, 9, 0), '09:00 18:00', 'abc', None],
+        ['09:00\n12:00\n13:00\n18:00'],
+        [1.5, 'null', '', '10:00,19:00', '#N/A'],
+    ]
+    for i, (name, punches) in enumerate(zip(names, punch_rows)):
+        info_row = [None] * 21
+        info_row[0], info_row[2], info_row[8], info_row[10] = 'No :', i + 1, 'Name :', name
+        if i % 2:
+            info_row = info_row[:11]  # 不规则行：信息行没有部门列
+        sheet.append(info_row)
+        sheet.append(punches)
+        if i < len(names) - 1:
+            sheet.append(date_row if i != 1 else date_row + [date(2025, 7, 18)])
+    workbook.save(path)
+
+
+@pytest.fixture(scope='module')
+def workbooks(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('readers')
+    paths = {}
+    paths['generated'] = str(folder / 'generated.xlsx')
+    generate_timecard(paths['generated'], employees=60, days=14, error_rate=0.1, seed=3)
+    paths['edge_cases'] = str(folder / 'edge_cases.xlsx')
+    _edge_case_workbook(paths['edge_cases'])
+    for n, path in enumerate(SAMPLE_UPLOADS):
+        paths[f'sample{n}'] = path
+    return paths
+
+
+@pytest.mark.parametrize('engine', [name for name in TIMECARD_READERS if name != 'pandas'])
+@pytest.mark.parametrize('name', ['generated', 'edge_cases'] + [f'sample{n}' for n in range(len(SAMPLE_UPLOADS))])
+def test_reader_matches_pandas(workbooks, name, engine):
+    expected = _layout(read_timecard(workbooks[name], 'pandas'))
+    assert _layout(read_timecard(workbooks[name], engine)) == expected
+
+
+def test_na_strings_match_pandas_defaults():
+    """本地定义的空值文本与当前pandas版本的默认na_values一致（pandas内部常量不存在时跳过）"""
+    parsers = pytest.importorskip('pandas._libs.parsers')
+    if not hasattr(parsers, 'STR_NA_VALUES'):
+        pytest.skip('pandas没有STR_NA_VALUES')
+    assert NA_STRINGS == frozenset(parsers.STR_NA_VALUES)
@@ -0,0 +1,105 @@
+"""
+并行模式（按员工分片的多进程分析）与单进程模式的输出必须完全一致
+用法: python -m pytest tests/test_parallel.py
+"""
+import multiprocessing
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+from benchmarks.timecard_generator import generate_timecard
+from processors.parallel import analyze_step1_rows
+from processors.timecard_processor import TimecardProcessor
+from utils import time_utils
+
+# 与运行环境相关的字段（耗时、缓存命中、输出路径），不参与比较
+_VOLATILE_KEYS = ('output_file', 'stage_timings', 'cache_stats')
+
+
+def _stable(result):
+    assert result['success'], result.get('error')
+    return {key: value for key, value in result.items() if key not in _VOLATILE_KEYS}
+
+
+def _workbook_cells(path):
+    """各工作表的单元格值、填充颜色和注释（处理日志包含耗时，不比较）"""
+    workbook = load_workbook(path)
+    sheets = {}
+    for sheet in workbook.worksheets:
+        if sheet.title == '处理日志':
+            continue
+        sheets[sheet.title] = [
+            (cell.coordinate, cell.value, cell.fill.fgColor.rgb, cell.comment.text if cell.comment else None)
+            for row in sheet.iter_rows() for cell in row
+        ]
+    workbook.close()
+    return sheets
+
+
+def _run_steps(source, work_dir, workers):
+    """在独立目录中完整运行Step1和Step2（每步前清空分析缓存，所有单元格都重新分析）"""
+    os.makedirs(work_dir)
+    processor = TimecardProcessor(work_dir, work_dir, workers=workers)
+    try:
+        time_utils.configure_analysis_cache(time_utils.ANALYSIS_CACHE_SIZE)
+        step1 = processor.process_step1(source)
+        error_file = os.path.join(work_dir, step1['output_file'])
+        time_utils.configure_analysis_cache(time_utils.ANALYSIS_CACHE_SIZE)
+        step2 = processor.process_step2(error_file, step1['time_range'])
+        assert (processor._pool is not None) == (workers > 1)
+    finally:
+        processor.close()
+    return step1, step2, work_dir
+
+
+@pytest.fixture(scope='module')
+def timecard(tmp_path_factory):
+    # 400名员工：workers=4 时分为4个分片
+    path = str(tmp_path_factory.mktemp('timecard') / 'timecard.xlsx')
+    generate_timecard(path, employees=400, days=14, error_rate=0.05, seed=7)
+    return path
+
+
+def test_parallel_matches_single_process(timecard, tmp_path):
+    serial = _run_steps(timecard, str(tmp_path / 'serial'), workers=1)
+    parallel = _run_steps(timecard, str(tmp_path / 'parallel'), workers=4)
+
+    for serial_result, parallel_result in zip(serial[:2], parallel[:2]):
+        assert _stable(parallel_result) == _stable(serial_result)
+        assert parallel_result['output_file'] == serial_result['output_file']
+        assert (_workbook_cells(os.path.join(parallel[2], parallel_result['output_file']))
+                == _workbook_cells(os.path.join(serial[2], serial_result['output_file'])))
+
+
+def _crash_in_child(shard):
+    """在子进程中直接退出，模拟分析进程被终止（如内存不足）"""
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return shard
+
+
+def test_broken_pool_falls_back_and_recovers(timecard, tmp_path):
+    processor = TimecardProcessor(str(tmp_path), str(tmp_path), workers=2)
+    try:
+        shards = [[1, 2], [3], [4, 5]]
+        assert processor._map_shards(_crash_in_child, shards) == shards  # 本批串行完成
+        assert processor._pool is None  # 损坏的进程池已丢弃
+
+        result = processor.process_step1(timecard)  # 重新创建进程池后正常处理
+        assert result['success'], result.get('error')
+        assert processor._pool is not None
+    finally:
+        processor.close()
+
+
+def test_step1_flags_odd_raw_time_count():
+    # 合法时间为偶数（09:00, 18:00），但识别出的打卡记录有3个，Step1仍标记为奇数时间记录（不计入统计）
+    [[(_, anomalies, extra)]] = analyze_step1_rows([('员工', ['25:00\n09:00\n18:00'])])
+    assert [anomaly['type'] for anomaly in anomalies] == ['invalid_time_format']
+    assert [anomaly['type'] for anomaly in extra] == ['odd_time_count']
+    assert extra[0]['message'].endswith('时间数量: 3')
+
+    # detect_time_anomalies已按合法时间标记时不重复添加
+    [[(_, anomalies, extra)]] = analyze_step1_rows([('员工', ['09:00\n12:00\n18:00'])])
+    assert [anomaly['type'] for anomaly in anomalies] == ['odd_time_count'] and extra == []
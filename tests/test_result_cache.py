@@ -0,0 +1,33 @@
+"""
+多个进程（gunicorn worker）共享同一个结果缓存目录：命中和大小上限按磁盘上的全部条目计算
+用法: python -m pytest tests/test_result_cache.py
+"""
+import os
+
+from processors.result_cache import ResultCache
+
+
+def _put(cache, folder, key, size):
+    output_path = os.path.join(folder, f'{key}.xlsx')
+    with open(output_path, 'wb') as f:
+        f.write(b'x' * size)
+    cache.put(key, {'success': True, 'output_file': f'{key}.xlsx'}, output_path)
+
+
+def test_workers_share_entries_and_size_limit(tmp_path):
+    cache_folder = str(tmp_path / 'cache')
+    worker_a = ResultCache(cache_folder, max_bytes=2500)
+    worker_b = ResultCache(cache_folder, max_bytes=2500)
+
+    _put(worker_a, str(tmp_path), 'a', 1000)
+    hit = worker_b.get('a', str(tmp_path))  # 其他进程写入的条目可以命中
+    assert hit is not None and hit['cached']
+
+    _put(worker_b, str(tmp_path), 'b', 1000)
+    _put(worker_a, str(tmp_path), 'c', 1000)  # 合计超过上限，淘汰最久未使用的条目a
+    assert worker_b.get('a', str(tmp_path)) is None
+    assert worker_a.get('b', str(tmp_path)) is not None
+
+    stats = worker_b.stats()
+    assert stats['entries'] == 2
+    assert stats['size_bytes'] <= 2500
@@ -0,0 +1,369 @@
+from datetime import datetime
+import math
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH, MAC_EPOCH
+
+# Timecard原始表读取方式注册表: 名称 -> 读取函数(file_path) -> 布局字典
+TIMECARD_READERS = {}
+
+# 与pd.read_excel默认一致的空值文本（pandas默认的na_values，不依赖pandas内部模块）
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+
+
+def timecard_reader(name):
+    """注册Timecard读取方式"""
+    def register(func):
+        TIMECARD_READERS[name] = func
+        return func
+    return register
+
+
+def read_timecard(file_path, engine='pandas'):
+    """
+    读取Timecard原始表，只提取布局需要的单元格
+    返回字典:
+    - shape: 与pd.read_excel结果一致的(行数, 列数)
+    - period: 时间范围文本（第1行第2列）
+    - date_row: 日期行（第2行）
+    - names: 员工姓名数组（第3(i+1)行第10列）
+    - punches: 打卡二维数组（第3(i+1)+1行，前len(日期)列）
+    所有取值与pd.read_excel得到的DataFrame一致
+    """
+    reader = TIMECARD_READERS.get(engine)
+    if reader is None:
+        raise ValueError(f"未知的Excel读取方式: {engine}，可选: {', '.join(TIMECARD_READERS)}")
+    if engine != 'pandas' and not zipfile.is_zipfile(file_path):
+        # 旧版.xls不是zip格式，交给pandas处理
+        reader = TIMECARD_READERS['pandas']
+    return reader(file_path)
+
+
+def _date_count(date_row):
+    return sum(1 for value in date_row if str(value) != 'nan')
+
+
+@timecard_reader('pandas')
+def _read_with_pandas(file_path):
+    """pd.read_excel读取整表后按步长切片"""
+    df = pd.read_excel(file_path)
+    date_row = df.iloc[2].to_list()
+    date_count = _date_count(date_row)
+    employee_amount = int((df.shape[0] - 2) / 3)
+
+    return {
+        'shape': df.shape,
+        'period': df.iloc[1, 2],
+        'date_row': date_row,
+        'names': df.iloc[3:3 * employee_amount + 1:3, 10].to_numpy(dtype=object),
+        'punches': df.iloc[4:3 * employee_amount + 2:3, 0:date_count].to_numpy(dtype=object)
+    }
+
+
+def _convert_cell(value, data_type):
+    """与pandas的openpyxl读取一致：空单元格为''，错误值为NaN，整数值的数字转为int"""
+    if value is None:
+        return ''
+    if data_type == 'e':
+        return math.nan
+    if data_type == 'n':
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+
+def _is_na(value):
+    if isinstance(value, str):
+        return value in NA_STRINGS
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _parse_number(value):
+    """数字或数字文本转换为数值，无法转换返回None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class _TimecardCollector:
+    """
+    逐行接收工作表数据（首行为表头），只保留Timecard布局需要的单元格，
+    同时按pandas的列类型推断规则记录哪些列会被识别为数值列:
+    列中所有非空值都是数字时为数值列（有空值或小数时为float，否则为int），
+    所有非空值都是日期时间时为datetime列（空值为NaT），
+    否则为object列，空值文本替换为NaN
+    """
+
+    def __init__(self):
+        self.width = 0
+        self.row_lengths = []  # 每个数据行的有效长度
+        self.last_data_row = -1  # 最后一个非空数据行
+        self.seen_cols = 0  # 数据行中出现过的列数
+        self.numeric_cols = {}  # 仍可能为数值列的列 -> 是否出现小数
+        self.datetime_cols = set()  # 仍可能为datetime列的列
+        self.na_cols = set()
+        self.period = ''
+        self.date_row = []
+        self.names = []
+        self.punches = []
+
+    def add_header(self, row):
+        self.width = max(self.width, self._trimmed_length(row))
+
+    def add_row(self, row):
+        r = len(self.row_lengths)  # pandas数据行号
+        length = self._trimmed_length(row)
+        self.row_lengths.append(length)
+        if length:
+            self.last_data_row = r
+            self.width = max(self.width, length)
+
+        self._track_types(row, length)
+
+        if r == 1:
+            self.period = row[2] if length > 2 else ''
+        elif r == 2:
+            self.date_row = list(row[:length])
+        elif r >= 3 and r % 3 == 0:
+            self.names.append(row[10] if length > 10 else '')
+        elif r >= 4 and r % 3 == 1:
+            # 日期列数取决于列类型（datetime列的空值NaT也计为日期），在finish中截取
+            self.punches.append(list(row[:length]))
+
+    @staticmethod
+    def _trimmed_length(row):
+        length = len(row)
+        while length and row[length - 1] == '':
+            length -= 1
+        return length
+
+    def _track_types(self, row, length):
+        # 新出现的列在此前的行中都是空值，先视为候选数值列
+        for j in range(self.seen_cols, length):
+            self.numeric_cols[j] = False
+            self.datetime_cols.add(j)
+        self.seen_cols = max(self.seen_cols, length)
+
+        for j in list(self.datetime_cols):
+            if j < length and not isinstance(row[j], datetime) and not _is_na(row[j]):
+                self.datetime_cols.discard(j)
+
+        for j, is_float in list(self.numeric_cols.items()):
+            if j >= length:
+                continue
+            value = row[j]
+            if _is_na(value):
+                self.na_cols.add(j)
+                continue
+            number = _parse_number(value)
+            if number is None:
+                del self.numeric_cols[j]
+            elif not is_float and isinstance(number, float):
+                self.numeric_cols[j] = True
+
+    def _typed(self, value, j, numeric_cols, datetime_cols=()):
+        if j in datetime_cols:
+            return pd.NaT if _is_na(value) else pd.Timestamp(value)
+        if j in numeric_cols:
+            if _is_na(value):
+                return math.nan
+            number = _parse_number(value)
+            return float(number) if numeric_cols[j] else int(number)
+        return math.nan if _is_na(value) else value
+
+    def finish(self):
+        row_count = self.last_data_row + 1
+        if row_count < 3:
+            raise ValueError("Timecard格式不正确：缺少时间范围或日期行")
+
+        # 行长度不足的列在该行为空值
+        numeric_cols = {}
+        for j, is_float in self.numeric_cols.items():
+            if j >= self.width:
+                continue
+            has_na = j in self.na_cols or any(
+                length <= j for length in self.row_lengths[:row_count]
+            )
+            numeric_cols[j] = is_float or has_na
+        for j in range(self.seen_cols, self.width):
+            numeric_cols[j] = True  # 只有表头的列，数据全部为空值
+        # 全部为空值的列为float列，不是datetime列
+        datetime_cols = {j for j in self.datetime_cols if j < self.width and j not in numeric_cols}
+
+        employee_amount = int((row_count - 2) / 3)
+        date_row = [self._typed(value, j, numeric_cols, datetime_cols) for j, value in enumerate(self.date_row)]
+        date_row.extend(self._typed('', j, numeric_cols, datetime_cols) for j in range(len(date_row), self.width))
+
+        names = np.empty(employee_amount, dtype=object)
+        names[:] = [self._typed(value, 10, numeric_cols, datetime_cols) for value in self.names[:employee_amount]]
+        date_count = _date_count(date_row)
+        punches = np.empty((employee_amount, date_count), dtype=object)
+        for i, row in enumerate(self.punches[:employee_amount]):
+            cells = row[:date_count] + [''] * (date_count - len(row))
+            punches[i, :] = [self._typed(value, j, numeric_cols, datetime_cols) for j, value in enumerate(cells)]
+
+        return {
+            'shape': (row_count, self.width),
+            'period': self._typed(self.period, 2, numeric_cols, datetime_cols),
+            'date_row': date_row,
+            'names': names,
+            'punches': punches
+        }
+
+
+def _collect(rows):
+    collector = _TimecardCollector()
+    for n, row in enumerate(rows):
+        if n == 0:
+            collector.add_header(row)
+        else:
+            collector.add_row(row)
+    return collector.finish()
+
+
+@timecard_reader('openpyxl')
+def _read_with_openpyxl(file_path):
+    """openpyxl只读模式流式读取，不构建DataFrame"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = ([_convert_cell(cell.value, cell.data_type) for cell in row] for row in sheet.rows)
+        return _collect(rows)
+    finally:
+        workbook.close()
+
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_TEXT_TAG = _MAIN_NS + 't'
+_RUN_TAG = _MAIN_NS + 'r'
+_DIGITS = '0123456789'
+
+
+def _inline_text(element):
+    """内联字符串的纯文本（与openpyxl的Text.content一致：正文加各富文本段，不含注音）"""
+    snippets = [element.findtext(_TEXT_TAG)]
+    snippets.extend(run.findtext(_TEXT_TAG) for run in element.iterfind(_RUN_TAG))
+    return ''.join(snippet for snippet in snippets if snippet)
+
+
+def _first_sheet_parts(archive):
+    """从workbook.xml及其关系文件找到第一个工作表、共享字符串和样式的路径"""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for rel in rels.iter(_PKG_REL_NS + 'Relationship'):
+        target = rel.get('Target')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+        targets[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+
+    sheet = workbook.find(f'{_MAIN_NS}sheets/{_MAIN_NS}sheet')
+    sheet_path = targets[sheet.get(_REL_NS + 'id')][1]
+    parts = {kind: target for kind, target in targets.values()}
+
+    properties = workbook.find(_MAIN_NS + 'workbookPr')
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+    return sheet_path, parts.get('sharedStrings'), parts.get('styles'), MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+
+def _iter_sheet_xml(archive, sheet_path, shared_strings, date_styles, epoch):
+    """直接解析工作表XML，按openpyxl只读模式的规则逐行返回单元格值"""
+    value_tag = _MAIN_NS + 'v'
+    inline_tag = _MAIN_NS + 'is'
+    row_tag = _MAIN_NS + 'row'
+    cell_tag = _MAIN_NS + 'c'
+
+    column_index = {}  # 列字母 -> 列号
+    next_row = 1
+    with archive.open(sheet_path) as source:
+        for _, element in ET.iterparse(source):
+            if element.tag != row_tag:
+                continue
+
+            row_number = int(element.get('r', next_row))
+            while next_row < row_number:  # 缺失的行为空行
+                yield []
+                next_row += 1
+            next_row = row_number + 1
+
+            values = []
+            for cell in element.iter(cell_tag):
+                coordinate = cell.get('r')
+                if coordinate:
+                    letters = coordinate.rstrip(_DIGITS)
+                    column = column_index.get(letters)
+                    if column is None:
+                        column = column_index[letters] = column_index_from_string(letters)
+                else:
+                    column = len(values) + 1
+                values.extend([''] * (column - 1 - len(values)))
+
+                data_type = cell.get('t', 'n')
+                value = None
+                if data_type == 'inlineStr':
+                    child = cell.find(inline_tag)
+                    if child is not None:
+                        value = _inline_text(child)
+                else:
+                    value = cell.findtext(value_tag) or None
+                    if value is not None:
+                        if data_type == 'n':
+                            value = float(value) if ('.' in value or 'E' in value or 'e' in value) else int(value)
+                            if int(cell.get('s', 0) or 0) in date_styles:
+                                data_type = 'd'
+                                try:
+                                    value = from_excel(value, epoch)
+                                except (OverflowError, ValueError):
+                                    data_type, value = 'e', '#VALUE!'
+                        elif data_type == 's':
+                            value = shared_strings[int(value)]
+                        elif data_type == 'b':
+                            value = bool(int(value))
+                        elif data_type == 'd':
+                            value = from_ISO8601(value)
+                values.append(_convert_cell(value, data_type))
+
+            element.clear()
+            yield values
+
+
+@timecard_reader('xml')
+def _read_with_xml(file_path):
+    """直接解析xlsx中的工作表XML，只取单元格值，跳过openpyxl的单元格对象"""
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_path, strings_path, styles_path, epoch = _first_sheet_parts(archive)
+
+        shared_strings = []
+        if strings_path and strings_path in archive.namelist():
+            with archive.open(strings_path) as source:
+                shared_strings = read_string_table(source)
+
+        date_styles = set()
+        if styles_path and styles_path in archive.namelist():
+            date_styles = Stylesheet.from_tree(ET.fromstring(archive.read(styles_path))).date_formats
+
+        return _collect(_iter_sheet_xml(archive, sheet_path, shared_strings, date_styles, epoch))
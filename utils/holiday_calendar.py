@@ -0,0 +1,113 @@
+from datetime import date, datetime, timedelta
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 默认计入考勤报告的法定假日（holidays库中的名称）
+DEFAULT_HOLIDAY_NAMES = ("New Year's Day", "Independence Day", "Labor Day", "Thanksgiving", "Christmas Day")
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def parse_time_range(time_range):
+    """
+    解析Step1生成的时间范围，返回 (开始日期, 结束日期)
+    支持 "20250713-0726"（结束日期省略年份）和 "20241225-20250107"；
+    省略年份且结束月日早于开始月日时视为跨年
+    """
+    start_str, end_str = time_range.split('-')
+    start_date = datetime.strptime(start_str[:8], '%Y%m%d').date()
+    if len(end_str) >= 8:
+        end_date = datetime.strptime(end_str[:8], '%Y%m%d').date()
+    else:
+        end_date = datetime.strptime(f'{start_date.year}{end_str[-4:]}', '%Y%m%d').date()
+        if end_date < start_date:
+            end_date = end_date.replace(year=start_date.year + 1)
+    return start_date, end_date
+
+
+class HolidayCalendar:
+    """
+    假期日历：按年份懒加载 日期 -> 假期名称 的索引，每个年份只构建一次
+    country: holidays库的国家代码，为None时只使用公司假期
+    holiday_names: 计入的法定假日名称，None表示全部计入
+    company_holidays: 公司自定义假期 {日期或'YYYY-MM-DD': 名称}，优先于法定假日
+    preload_years: 创建时预先构建索引的年份
+    """
+
+    def __init__(self, country='US', holiday_names=DEFAULT_HOLIDAY_NAMES, company_holidays=None,
+                 subdiv=None, preload_years=()):
+        self.country = country
+        self.subdiv = subdiv
+        self.holiday_names = frozenset(holiday_names) if holiday_names is not None else None
+        self.company_holidays = {_to_date(day): name for day, name in (company_holidays or {}).items()}
+        self._years = {}  # 年份 -> {日期: 名称}
+        self._lock = threading.Lock()
+        for year in preload_years:
+            self._year_index(year)
+
+    def _build_year(self, year):
+        index = {}
+        if self.country:
+            import holidays  # 导入较慢，首次构建索引时才导入
+            for day, name in holidays.country_holidays(self.country, subdiv=self.subdiv, years=year).items():
+                if self.holiday_names is None or name in self.holiday_names:
+                    index[day] = name
+        for day, name in self.company_holidays.items():
+            if day.year == year:
+                index[day] = name
+        logger.debug("📅 构建假期索引: %d年, %d个假期", year, len(index))
+        return index
+
+    def _year_index(self, year):
+        index = self._years.get(year)
+        if index is None:
+            with self._lock:
+                index = self._years.get(year)
+                if index is None:
+                    index = self._years[year] = self._build_year(year)
+        return index
+
+    def holiday_name(self, day):
+        """返回某天的假期名称，不是假期时返回None"""
+        return self._year_index(day.year).get(day)
+
+    def holidays_between(self, start_date, end_date):
+        """返回 [start_date, end_date] 闭区间内的假期 [(日期, 名称), ...]，可跨年"""
+        found = []
+        day = start_date
+        while day <= end_date:
+            name = self.holiday_name(day)
+            if name is not None:
+                found.append((day, name))
+            day += timedelta(days=1)
+        return found
+
+    def signature(self):
+        """日历配置摘要，用于结果缓存键"""
+        return {
+            'country': self.country,
+            'subdiv': self.subdiv,
+            'holiday_names': sorted(self.holiday_names) if self.holiday_names is not None else None,
+            'company_holidays': sorted((day.isoformat(), name) for day, name in self.company_holidays.items())
+        }
+
+
+_default_calendar = None
+_default_calendar_lock = threading.Lock()
+
+
+def get_default_calendar():
+    """默认假期日历（美国法定假日），首次使用时创建并在进程内共享"""
+    global _default_calendar
+    with _default_calendar_lock:
+        if _default_calendar is None:
+            _default_calendar = HolidayCalendar()
+        return _default_calendar
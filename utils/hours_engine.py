@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def build_punch_arrays(minute_lists):
+    """
+    将每个单元格的打卡分钟数展平为不规则数组
+    返回 (offsets, values)：第k个单元格的打卡为 values[offsets[k]:offsets[k + 1]]
+    """
+    counts = np.fromiter((len(minutes) for minutes in minute_lists), dtype=np.int64, count=len(minute_lists))
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    values = np.fromiter(
+        (minute for minutes in minute_lists for minute in minutes),
+        dtype=np.int64,
+        count=int(offsets[-1])
+    )
+    return offsets, values
+
+
+def compute_punch_metrics(offsets, values):
+    """
+    一次性计算所有单元格的打卡指标
+    返回字典，每项为长度等于单元格数量的数组:
+    - counts: 打卡次数
+    - paired_minutes: 按(上班, 下班)两两配对的工作分钟数之和（仅偶数次打卡有意义）
+    - odd_count: 打卡次数是否为奇数
+    - first / last: 第一次与最后一次打卡（无打卡为-1）
+    """
+    num_cells = len(offsets) - 1
+    counts = np.diff(offsets)
+    cell_index = np.repeat(np.arange(num_cells), counts)
+
+    # 单元格内位置：偶数位为上班（减），奇数位为下班（加）
+    position = np.arange(len(values)) - offsets[:-1][cell_index]
+    signed = np.where(position % 2 == 1, values, -values)
+    paired_minutes = np.bincount(cell_index, weights=signed, minlength=num_cells).astype(np.int64)
+
+    has_punch = counts > 0
+    first = np.full(num_cells, -1, dtype=np.int64)
+    last = np.full(num_cells, -1, dtype=np.int64)
+    first[has_punch] = values[offsets[:-1][has_punch]]
+    last[has_punch] = values[offsets[1:][has_punch] - 1]
+
+    return {
+        'counts': counts,
+        'paired_minutes': paired_minutes,
+        'odd_count': counts % 2 == 1,
+        'first': first,
+        'last': last
+    }
+
+
+def minutes_to_hours_array(minutes):
+    """分钟数组转换为小时（保留两位小数）"""
+    return np.round(np.asarray(minutes) / 60, 2)
@@ -1,14 +1,24 @@
+from array import array
 from datetime import datetime
+from functools import lru_cache
 import re
 import logging
 
+logger = logging.getLogger(__name__)
+
 
 def get_minimum_distance(letter):
     """计算冒号之间的最小距离"""
     position = []
-    for i in range(len(letter)):
-        if letter[i] == ':':
+    if isinstance(letter, str):
+        i = letter.find(':')
+        while i != -1:
             position.append(i)
+            i = letter.find(':', i + 1)
+    else:
+        for i in range(len(letter)):
+            if letter[i] == ':':
+                position.append(i)
 
     if len(position) > 1:
         j = len(position) - 1
@@ -23,95 +33,148 @@ def get_minimum_distance(letter):
 
 
 def daily_working_time(time_list_normalized):
-    """计算每日工作时间"""
+    """计算每日工作时间，输入为当日分钟数列表"""
     time_part = []
     i = len(time_list_normalized)
 
     while (i >= 1):
-        time_difference = (time_list_normalized[i - 1] - time_list_normalized[i - 2]).total_seconds() / (60 * 60)
+        time_difference = time_list_normalized[i - 1] - time_list_normalized[i - 2]
         i = i - 2
         time_part.append(time_difference)
 
-    return round(sum(time_part), 2)
+    return minutes_to_hours(sum(time_part))
 
 
-def parse_time_string(raw_time_str):
+# 预编译的时间匹配模式，避免每次调用重新编译
+_TIME_TOKEN_PATTERN = re.compile(r'\b(\d{1,2}):(\d{2})\b')
+_TIME_FORMAT_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+
+def _strptime_accepts(time_str):
     """
-    增强的时间字符串解析，支持多种分隔符和格式
-    支持格式:
-    - 换行分隔: "10:36\n11:18\n11:33\n21:10"
-    - 空格分隔: "10:36  11:18 11:33 21:10"
-    - 逗号分隔: "10:36,11:18,11:33,21:10"
-    - 制表符分隔: "10:36\t11:18\t11:33\t21:10"
-    - 混合分隔符
+    非ASCII数字（如全角数字"０９:００"）的时间按datetime.strptime判断能否解析
+    正则的数字匹配和int()都接受全角数字，而原实现用strptime转换时会拒绝这类时间
     """
-    import re
+    try:
+        datetime.strptime(time_str, '%H:%M')
+    except ValueError:
+        return False
+    return True
 
-    if not raw_time_str or str(raw_time_str).strip() in ['nan', '', 'None']:
-        return []
+
+# 视为空单元格的字符串
+NULL_TIME_STRINGS = ('nan', '', 'None')
+
+# 支持的时间分隔符（顺序即混合分隔符报告中的顺序）
+TIME_SEPARATORS = ('\n', ' ', '\t', ',', ';')
+
+# 非分隔符的残余片段才记为无法识别
+_SEPARATOR_CHARS = ' \t,;\r'
+
+
+def _empty_tokenize_result(raw_time_str):
+    return {
+        'raw': raw_time_str,
+        'times': (),
+        'minutes': (),
+        'invalid_times': (),
+        'separators': (),
+        'malformed': ()
+    }
+
+
+def tokenize_time_string(raw_time_str):
+    """
+    单次扫描解析打卡字符串
+    一次遍历同时得到:
+    - times: 识别出的时间文本（与parse_time_string结果一致）
+    - minutes: 合法时间对应的当日分钟数 (0-1439)
+    - invalid_times: 格式正确但超出范围的时间，如 "25:00"
+    - separators: 字符串中出现的分隔符
+    - malformed: 无法识别为时间的片段
+    """
+    if not raw_time_str:
+        return _empty_tokenize_result('')
 
     raw_time_str = str(raw_time_str).strip()
-    time_list = []
+    if raw_time_str in NULL_TIME_STRINGS:
+        return _empty_tokenize_result(raw_time_str)
 
-    # 方法1: 处理换行分隔
-    if '\n' in raw_time_str:
-        # 先按换行分割，然后处理每一行
-        lines = raw_time_str.split('\n')
-        print(f"📝 换行分割: {raw_time_str} -> {lines}")
+    times = []
+    minutes = []
+    invalid_times = []
+    malformed = []
 
-        for line in lines:
+    # 换行分隔时逐行处理：行内有空格则提取所有时间，否则整行必须是一个时间
+    multiline = '\n' in raw_time_str
+    lines = raw_time_str.split('\n') if multiline else (raw_time_str,)
+
+    for line in lines:
+        if multiline:
             line = line.strip()
             if not line:
                 continue
-
-            # 如果行内还有空格分隔的时间，进一步分割
-            if ' ' in line:
-                # 使用正则表达式提取该行中的所有时间
-                time_pattern = r'\b\d{1,2}:\d{2}\b'
-                line_times = re.findall(time_pattern, line)
-                time_list.extend(line_times)
-                print(f"📝 行内空格分割: '{line}' -> {line_times}")
+            if ' ' not in line:
+                match = _TIME_FORMAT_PATTERN.match(line)
+                matches = (match,) if match else ()
             else:
-                # 单行单个时间
-                if re.match(r'^\d{1,2}:\d{2}$', line):
-                    time_list.append(line)
-                    print(f"📝 单行时间: '{line}'")
-
-    # 方法2: 处理其他分隔符（空格、制表符、逗号等）
-    elif any(sep in raw_time_str for sep in [' ', '\t', ',', ';']):
-        # 先用正则表达式提取所有可能的时间
-        time_pattern = r'\b\d{1,2}:\d{2}\b'
-        time_matches = re.findall(time_pattern, raw_time_str)
-        if time_matches:
-            time_list = time_matches
-            print(f"📝 正则提取（有分隔符）: {raw_time_str} -> {time_list}")
+                matches = _TIME_TOKEN_PATTERN.finditer(line)
         else:
-            # 如果正则没匹配到，尝试分割
-            # 尝试多种分隔符
-            for separator in [' ', '\t', ',', ';', '  ', '   ']:
-                if separator in raw_time_str:
-                    time_list = raw_time_str.split(separator)
-                    break
-            print(f"📝 分隔符分割: {raw_time_str} -> {time_list}")
-
-    # 方法3: 使用正则表达式提取所有时间格式（兜底方案）
-    else:
-        time_pattern = r'\b\d{1,2}:\d{2}\b'
-        time_list = re.findall(time_pattern, raw_time_str)
-        print(f"📝 正则提取（无分隔符）: {raw_time_str} -> {time_list}")
-
-    # 清理和验证时间列表
-    cleaned_times = []
-    for time_str in time_list:
-        time_str = time_str.strip()
-        if time_str and time_str != '' and ':' in time_str:
-            # 基础格式验证
-            if re.match(r'^\d{1,2}:\d{2}$', time_str):
-                cleaned_times.append(time_str)
+            matches = _TIME_TOKEN_PATTERN.finditer(line)
+
+        last_end = 0
+        for match in matches:
+            gap = line[last_end:match.start()].strip(_SEPARATOR_CHARS)
+            if gap:
+                malformed.append(gap)
+            last_end = match.end()
+
+            time_str = match.group(0)
+            hour, minute = int(match.group(1)), int(match.group(2))
+            times.append(time_str)
+            if hour <= 23 and minute <= 59:
+                # 格式有效但无法转换的非ASCII时间既不计入打卡也不算格式无效，与原实现一致
+                if time_str.isascii() or _strptime_accepts(time_str):
+                    minutes.append(hour * 60 + minute)
             else:
-                print(f"⚠️ 跳过无效格式: '{time_str}'")
+                invalid_times.append(time_str)
+
+        gap = line[last_end:].strip(_SEPARATOR_CHARS)
+        if gap:
+            malformed.append(gap)
+
+    return {
+        'raw': raw_time_str,
+        'times': tuple(times),
+        'minutes': tuple(minutes),
+        'invalid_times': tuple(invalid_times),
+        'separators': tuple(sep for sep in TIME_SEPARATORS if sep in raw_time_str),
+        'malformed': tuple(malformed)
+    }
+
+
+def format_minutes(minutes):
+    """将当日分钟数格式化为HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def minutes_to_hours(minutes):
+    """分钟数转换为小时（保留两位小数），只在输出时调用"""
+    return round(minutes / 60, 2)
+
 
-    print(f"🔄 最终清理后: {cleaned_times}")
+def parse_time_string(raw_time_str):
+    """
+    增强的时间字符串解析，支持多种分隔符和格式
+    支持格式:
+    - 换行分隔: "10:36\n11:18\n11:33\n21:10"
+    - 空格分隔: "10:36  11:18 11:33 21:10"
+    - 逗号分隔: "10:36,11:18,11:33,21:10"
+    - 制表符分隔: "10:36\t11:18\t11:33\t21:10"
+    - 混合分隔符
+    """
+    cleaned_times = list(analyze_time_cell(raw_time_str)['times'])
+    logger.debug("🔄 最终清理后: %s", cleaned_times)
     return cleaned_times
 
 
@@ -123,7 +186,7 @@ def validate_time_format(time_str):
     time_str = time_str.strip()
 
     # 检查基本格式
-    if not re.match(r'^\d{1,2}:\d{2}$', time_str):
+    if not _TIME_FORMAT_PATTERN.match(time_str):
         return False
 
     try:
@@ -141,13 +204,13 @@ def validate_time_format(time_str):
 
 def normalize_time_list(time_list):
     """
-    规范化时间列表，返回datetime对象列表
+    规范化时间列表，返回当日分钟数数组 array('H')
     增加了更详细的错误处理和日志记录
     """
+    time_list_normalized = array('H')
     if not time_list:
-        return []
+        return time_list_normalized
 
-    time_list_normalized = []
     invalid_times = []
 
     for time_str in time_list:
@@ -157,124 +220,187 @@ def normalize_time_list(time_list):
             continue
 
         if validate_time_format(time_str):
-            try:
-                date_time_obj = datetime.strptime(time_str, '%H:%M')
-                time_list_normalized.append(date_time_obj)
-            except ValueError as e:
-                invalid_times.append(f"{time_str} (解析错误: {e})")
-                print(f"⚠️ 时间解析失败: {time_str} - {e}")
+            if not (time_str.isascii() or _strptime_accepts(time_str)):
+                invalid_times.append(f"{time_str} (解析错误)")
+                logger.debug("⚠️ 时间解析失败: %s", time_str)
+                continue
+            hour, minute = time_str.split(':')
+            time_list_normalized.append(int(hour) * 60 + int(minute))
         else:
             invalid_times.append(f"{time_str} (格式无效)")
-            print(f"⚠️ 时间格式无效: {time_str}")
+            logger.debug("⚠️ 时间格式无效: %s", time_str)
 
     if invalid_times:
-        print(f"🚨 发现 {len(invalid_times)} 个无效时间: {invalid_times}")
+        logger.debug("🚨 发现 %d 个无效时间: %s", len(invalid_times), invalid_times)
 
-    print(f"✅ 成功解析 {len(time_list_normalized)} 个有效时间")
+    logger.debug("✅ 成功解析 %d 个有效时间", len(time_list_normalized))
     return time_list_normalized
 
 
-def detect_time_anomalies(raw_time_str, employee_name, column_idx):
+# 异常检测器注册表：按注册顺序执行，注册顺序即异常优先级
+ANOMALY_DETECTORS = []
+_DETECTORS_BY_TYPE = {}
+
+
+def anomaly_detector(anomaly_type, label, severity, color, description):
     """
-    检测时间数据异常
-    返回异常类型和详细信息，包含颜色映射
+    注册异常检测器
+    检测函数接收analyze_time_cell的分析结果，发现异常时返回详情文本，否则返回None
     """
-    anomalies = []
+    def register(detect):
+        detector = {
+            'type': anomaly_type,
+            'label': label,
+            'severity': severity,
+            'color': color,
+            'description': description,
+            'detect': detect
+        }
+        ANOMALY_DETECTORS.append(detector)
+        _DETECTORS_BY_TYPE[anomaly_type] = detector
+        return detect
+    return register
 
-    if not raw_time_str or str(raw_time_str).strip() in ['nan', '', 'None']:
-        return anomalies
 
-    raw_time_str = str(raw_time_str).strip()
+@anomaly_detector('colon_distance', '冒号距离异常', 'warning', 'FFC7CE',  # 浅红色
+                  '时间格式问题，冒号前后数字位数异常')
+def _detect_colon_distance(cell):
+    if cell['colon_distance'] == 3:
+        return f"最小距离: {cell['colon_distance']}"
 
-    # 检测1: 冒号距离异常
-    letter = [x for x in raw_time_str]
-    min_distance = get_minimum_distance(letter)
-    if min_distance == 3:
-        anomalies.append({
-            'type': 'colon_distance',
-            'message': f'冒号距离异常 - 员工: {employee_name}, 列: {column_idx}, 最小距离: {min_distance}',
-            'severity': 'warning',
-            'color': 'FFC7CE',  # 浅红色
-            'description': '时间格式问题，冒号前后数字位数异常'
-        })
 
-    # 检测2: 解析时间
-    time_list = parse_time_string(raw_time_str)
-    valid_times = normalize_time_list(time_list)
-
-    # 检测3: 奇数时间记录
-    if len(valid_times) % 2 != 0:
-        anomalies.append({
-            'type': 'odd_time_count',
-            'message': f'奇数时间记录 - 员工: {employee_name}, 列: {column_idx}, 时间数量: {len(valid_times)}',
-            'severity': 'error',
-            'color': 'FF0000',  # 深红色
-            'description': '打卡次数为奇数，无法配对计算工时'
-        })
+@anomaly_detector('odd_time_count', '奇数时间记录', 'error', 'FF0000',  # 深红色
+                  '打卡次数为奇数，无法配对计算工时')
+def _detect_odd_time_count(cell):
+    if len(cell['minutes']) % 2 != 0:
+        return f"时间数量: {len(cell['minutes'])}"
+
 
-    # 检测4: 时间跨度异常
+@anomaly_detector('long_work_span', '工作时间跨度异常', 'warning', 'FFD700',  # 金色
+                  '单日工作时间跨度超过16小时，可能存在数据错误')
+def _detect_long_work_span(cell):
+    valid_times = cell['minutes']
     if len(valid_times) >= 2:
-        time_span = (valid_times[-1] - valid_times[0]).total_seconds() / 3600
+        time_span = (valid_times[-1] - valid_times[0]) / 60
         if time_span > 16:  # 工作时间跨度超过16小时
-            anomalies.append({
-                'type': 'long_work_span',
-                'message': f'工作时间跨度异常 - 员工: {employee_name}, 列: {column_idx}, 跨度: {time_span:.1f}小时',
-                'severity': 'warning',
-                'color': 'FFD700',  # 金色
-                'description': '单日工作时间跨度超过16小时，可能存在数据错误'
-            })
-
-    # 检测5: 时间顺序异常
-    if len(valid_times) >= 2:
-        for i in range(1, len(valid_times)):
-            if valid_times[i] <= valid_times[i - 1]:
-                anomalies.append({
-                    'type': 'time_sequence_error',
-                    'message': f'时间顺序异常 - 员工: {employee_name}, 列: {column_idx}, {valid_times[i - 1].strftime("%H:%M")} >= {valid_times[i].strftime("%H:%M")}',
-                    'severity': 'error',
-                    'color': 'FF8C00',  # 深橙色
-                    'description': '打卡时间顺序混乱，后一个时间早于前一个时间'
-                })
-                break
-
-    # 检测6: 时间格式无效
-    invalid_times = []
-    for time_str in time_list:
-        if not validate_time_format(time_str):
-            invalid_times.append(time_str)
+            return f"跨度: {time_span:.1f}小时"
 
-    if invalid_times:
-        anomalies.append({
-            'type': 'invalid_time_format',
-            'message': f'时间格式无效 - 员工: {employee_name}, 列: {column_idx}, 无效时间: {invalid_times}',
-            'severity': 'error',
-            'color': 'FF6B6B',  # 橙红色
-            'description': '时间格式不符合HH:MM标准'
-        })
 
-    # 检测7: 解析错误
-    if not time_list and raw_time_str not in ['nan', '', 'None']:
-        anomalies.append({
-            'type': 'parse_error',
-            'message': f'解析错误 - 员工: {employee_name}, 列: {column_idx}, 原始数据: {raw_time_str}',
-            'severity': 'error',
-            'color': '9932CC',  # 紫色
-            'description': '时间字符串无法正确解析'
-        })
+@anomaly_detector('time_sequence_error', '时间顺序异常', 'error', 'FF8C00',  # 深橙色
+                  '打卡时间顺序混乱，后一个时间早于前一个时间')
+def _detect_time_sequence_error(cell):
+    valid_times = cell['minutes']
+    for i in range(1, len(valid_times)):
+        if valid_times[i] <= valid_times[i - 1]:
+            return f"{format_minutes(valid_times[i - 1])} >= {format_minutes(valid_times[i])}"
 
-    # 检测8: 混合分隔符
-    separators = ['\n', ' ', '\t', ',', ';']
-    found_separators = [sep for sep in separators if sep in raw_time_str]
-    if len(found_separators) > 1:
-        anomalies.append({
-            'type': 'mixed_separators',
-            'message': f'混合分隔符 - 员工: {employee_name}, 列: {column_idx}, 分隔符: {found_separators}',
-            'severity': 'warning',
-            'color': '87CEEB',  # 天蓝色
-            'description': '时间字符串包含多种分隔符，可能导致解析错误'
-        })
 
-    return anomalies
+@anomaly_detector('invalid_time_format', '时间格式无效', 'error', 'FF6B6B',  # 橙红色
+                  '时间格式不符合HH:MM标准')
+def _detect_invalid_time_format(cell):
+    if cell['invalid_times']:
+        return f"无效时间: {list(cell['invalid_times'])}"
+
+
+@anomaly_detector('parse_error', '解析错误', 'error', '9932CC',  # 紫色
+                  '时间字符串无法正确解析')
+def _detect_parse_error(cell):
+    if not cell['times']:
+        return f"原始数据: {cell['raw']}"
+
+
+@anomaly_detector('mixed_separators', '混合分隔符', 'warning', '87CEEB',  # 天蓝色
+                  '时间字符串包含多种分隔符，可能导致解析错误')
+def _detect_mixed_separators(cell):
+    if len(cell['separators']) > 1:
+        return f"分隔符: {list(cell['separators'])}"
+
+
+def _analyze_time_cell(raw_time_str):
+    """
+    单元格分析：每个单元格只解析一次，结果供所有异常检测器共享
+    在tokenize_time_string结果的基础上增加:
+    - colon_distance: 冒号之间的最小距离
+    - anomalies: 检测到的异常 (类型, 详情) 元组，与员工和列无关
+    """
+    analysis = tokenize_time_string(raw_time_str)
+    if analysis['raw'] in NULL_TIME_STRINGS:
+        analysis['colon_distance'] = None
+        analysis['anomalies'] = ()
+        return analysis
+
+    analysis['colon_distance'] = get_minimum_distance(analysis['raw'])
+
+    found = []
+    for detector in ANOMALY_DETECTORS:
+        detail = detector['detect'](analysis)
+        if detail is not None:
+            found.append((detector['type'], detail))
+    analysis['anomalies'] = tuple(found)
+    return analysis
+
+
+# 单元格分析结果与员工和列无关，按原始字符串缓存；相同的打卡字符串在导出表中大量重复
+ANALYSIS_CACHE_SIZE = 65536
+_analysis_cache = lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(_analyze_time_cell)
+
+
+def configure_analysis_cache(maxsize):
+    """设置单元格分析缓存大小（0为不缓存，None为不限），会清空已有缓存"""
+    global _analysis_cache
+    _analysis_cache = lru_cache(maxsize=maxsize)(_analyze_time_cell)
+
+
+def analysis_cache_stats():
+    """单元格分析缓存的命中统计"""
+    info = _analysis_cache.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_ratio': round(info.hits / lookups, 4) if lookups else 0.0,
+        'size': info.currsize,
+        'maxsize': info.maxsize
+    }
+
+
+def analyze_time_cell(raw_time_str):
+    """
+    带缓存的单元格分析（见_analyze_time_cell）
+    相同字符串返回同一个结果字典，调用方不得修改
+    """
+    try:
+        return _analysis_cache(raw_time_str)
+    except TypeError:  # 不可哈希的输入不缓存
+        return _analyze_time_cell(raw_time_str)
+
+
+def build_anomaly(anomaly_type, detail, employee_name, column_idx):
+    """为检测结果附加员工和列信息，生成异常记录"""
+    detector = _DETECTORS_BY_TYPE[anomaly_type]
+    return {
+        'type': anomaly_type,
+        'message': f"{detector['label']} - 员工: {employee_name}, 列: {column_idx}, {detail}",
+        'severity': detector['severity'],
+        'color': detector['color'],
+        'description': detector['description']
+    }
+
+
+def detect_time_anomalies(raw_time_str, employee_name, column_idx, analysis=None):
+    """
+    检测时间数据异常
+    返回异常类型和详细信息，包含颜色映射
+    analysis: 可选，analyze_time_cell的结果，传入时不再重复解析
+    """
+    if not raw_time_str or str(raw_time_str).strip() in NULL_TIME_STRINGS:
+        return []
+
+    if analysis is None:
+        analysis = analyze_time_cell(raw_time_str)
+
+    return [build_anomaly(anomaly_type, detail, employee_name, column_idx)
+            for anomaly_type, detail in analysis['anomalies']]
 
 
 def format_time_for_display(time_list):
@@ -284,12 +410,16 @@ def format_time_for_display(time_list):
     if not time_list:
         return ""
 
-    return " | ".join([t.strftime("%H:%M") if isinstance(t, datetime) else str(t) for t in time_list])
+    return " | ".join([
+        t.strftime("%H:%M") if isinstance(t, datetime) else format_minutes(t) if isinstance(t, int) else str(t)
+        for t in time_list
+    ])
 
 
 def calculate_working_hours_with_details(time_list_normalized):
     """
     计算工作时间并返回详细信息
+    time_list_normalized: 当日分钟数列表，工时在返回时才换算为小时
     """
     if not time_list_normalized or len(time_list_normalized) == 0:
         return {
@@ -308,24 +438,24 @@ def calculate_working_hours_with_details(time_list_normalized):
         }
 
     work_periods = []
-    total_hours = 0
+    total_minutes = 0
 
     for i in range(0, len(time_list_normalized), 2):
         start_time = time_list_normalized[i]
         end_time = time_list_normalized[i + 1]
 
-        period_hours = (end_time - start_time).total_seconds() / 3600
+        period_minutes = end_time - start_time
 
         work_periods.append({
-            'start': start_time.strftime("%H:%M"),
-            'end': end_time.strftime("%H:%M"),
-            'hours': round(period_hours, 2)
+            'start': format_minutes(start_time),
+            'end': format_minutes(end_time),
+            'hours': minutes_to_hours(period_minutes)
         })
 
-        total_hours += period_hours
+        total_minutes += period_minutes
 
     return {
-        'total_hours': round(total_hours, 2),
+        'total_hours': minutes_to_hours(total_minutes),
         'work_periods': work_periods,
         'is_valid': True,
         'error': None
@@ -0,0 +1,7 @@
+"""WSGI入口：gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import app
+
+application = app
+
+if __name__ == '__main__':
+    app.run(host=app.config['SERVER_HOST'], port=app.config['SERVER_PORT'])